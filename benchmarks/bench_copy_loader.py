@@ -0,0 +1,102 @@
+"""executemany INSERT vs COPY bulk loading of processed quotes.
+
+Usage: python -m benchmarks.bench_copy_loader [--rows N] [--dsn DSN]
+
+Always times the client-side work: building insert_data tuples with the
+per-column map the upload page used, against prepare_copy_frame plus CSV
+serialization. With --dsn it also loads the rows into a temporary copy of
+singtel_data both ways and reports rows per second (the INSERT
+side on the first 20,000 rows, it is that slow).
+"""
+import argparse
+import random
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from singtel.db.db_connection import (
+    copy_data,
+    dataframe_to_records,
+    insert_data,
+    prepare_copy_frame,
+)
+
+
+def processed_quotes(rows, seed=0):
+    rng = random.Random(seed)
+    qty = [rng.choice([1, 2, 5, 10, "", 0]) for _ in range(rows)]
+    total = [rng.uniform(0, 10_000) for _ in range(rows)]
+    unit = [t / q if isinstance(q, int) and q else np.inf for t, q in zip(total, qty)]
+    return pd.DataFrame(
+        {
+            "Date": [rng.choice(["14-Nov-2024", "01-Jan-2024", ""]) for _ in range(rows)],
+            "Item": [rng.choice(["Router", "Support, 24x7", 'Cable "Cat6"']) for _ in range(rows)],
+            "Description": [rng.choice(["Install\nand test", "Licence", ""]) for _ in range(rows)],
+            "Country": "Singapore",
+            "City": "Singapore",
+            "Supplier": "Stub Supplier",
+            "Quote #": [f"Q-{i % 500}" for i in range(rows)],
+            "Currency": "USD",
+            "Total Cost": total,
+            "QTY": qty,
+            "Hours": [rng.choice([8, 40, "", 168]) for _ in range(rows)],
+            "Unit Cost": unit,
+            "Unit Cost (USD)": unit,
+        }
+    )
+
+
+def timed(label, fn, rows):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed:8.2f} s  {rows / elapsed:12.0f} rows/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dsn", default=None)
+    args = parser.parse_args()
+
+    df = processed_quotes(args.rows)
+    # Infinite unit costs are NULL on the COPY path, compare like with like
+    finite = df.replace([np.inf, -np.inf], np.nan)
+    timed("tuples for executemany", lambda: dataframe_to_records(finite), args.rows)
+    timed(
+        "COPY frame + CSV",
+        lambda: prepare_copy_frame(df).to_csv(StringIO(), header=False, index=False),
+        args.rows,
+    )
+    if not args.dsn:
+        return
+
+    import psycopg2
+
+    # One plain connection: the temp table below only exists in its session
+    connection = psycopg2.connect(args.dsn)
+    cursor = connection.cursor()
+    # A temp table shadows singtel_data for this session only; the id column
+    # is dropped so the real table's sequence is left alone.
+    cursor.execute(
+        "CREATE TEMP TABLE singtel_data AS SELECT * FROM public.singtel_data WITH NO DATA"
+    )
+    cursor.execute("ALTER TABLE singtel_data DROP COLUMN id")
+    connection.commit()
+    records = dataframe_to_records(finite)
+    sample = records[: min(len(records), 20_000)]
+    start = time.perf_counter()
+    insert_data(connection, [tuple(r) for r in sample])
+    elapsed = time.perf_counter() - start
+    print(f"{'executemany INSERT':<36} {elapsed:8.2f} s  {len(sample) / elapsed:12.0f} rows/s"
+          f"  ({len(sample)} rows)")
+    timed("COPY FROM STDIN", lambda: print(copy_data(connection, df)),
+          args.rows)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
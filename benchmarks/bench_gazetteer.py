@@ -0,0 +1,108 @@
+"""Compare the compiled gazetteer with the old read-the-CSV-per-call helpers.
+
+Usage: python -m benchmarks.bench_gazetteer [--csv PATH] [--cities N] [--lookups N]
+
+Without --csv a synthetic worldcities-shaped file is generated.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from singtel.process import gazetteer as gz
+
+
+def legacy_city_country_iso_mapped_list(file_path):
+    # What the removed utility.city_country_iso_mapped_list did on every call.
+    city_country_df = pd.read_csv(file_path)
+    city_country_df_aggregated = (
+        city_country_df.groupby("city_ascii").first().reset_index()
+    )
+    city_to_country = city_country_df_aggregated.set_index("city_ascii")[
+        ["country"]
+    ].to_dict("index")
+    iso2_to_country = (
+        city_country_df_aggregated[["iso2", "country"]]
+        .drop_duplicates()
+        .set_index("iso2")["country"]
+        .to_dict()
+    )
+    return city_to_country, iso2_to_country
+
+
+def write_synthetic_csv(path, cities):
+    rng = random.Random(0)
+    countries = [(f"Country{i}", f"{chr(65 + i // 26)}{chr(65 + i % 26)}") for i in range(240)]
+    rows = []
+    for i in range(cities):
+        country, iso2 = rng.choice(countries)
+        rows.append(
+            {
+                "city": f"City{i}",
+                "city_ascii": f"City{i}",
+                "lat": rng.uniform(-90, 90),
+                "lng": rng.uniform(-180, 180),
+                "country": country,
+                "iso2": iso2,
+                "population": rng.randint(1000, 10_000_000),
+            }
+        )
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed / repeat * 1000:10.3f} ms/call  ({repeat} calls)")
+    return elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default=None)
+    parser.add_argument("--cities", type=int, default=45_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(tmp, "worldcities.csv")
+            write_synthetic_csv(csv_path, args.cities)
+
+        city_to_country, iso2_to_country = legacy_city_country_iso_mapped_list(csv_path)
+        cities = random.Random(1).choices(list(city_to_country), k=args.lookups)
+        iso2s = random.Random(2).choices(list(iso2_to_country), k=args.lookups)
+
+        legacy = timed(
+            "legacy: parse CSV per lookup",
+            lambda: legacy_city_country_iso_mapped_list(csv_path),
+            repeat=5,
+        )
+        timed("compile CSV -> artifact", lambda: gz.build_artifact(csv_path), repeat=3)
+        load = timed("load artifact", lambda: gz.load_gazetteer(csv_path), repeat=5)
+
+        index = gz.load_gazetteer(csv_path)
+        start = time.perf_counter()
+        for city, iso2 in zip(cities, iso2s):
+            index.country_for_city(city)
+            index.country_for_iso2(iso2)
+            index.is_country(city)
+        per_lookup = (time.perf_counter() - start) / args.lookups
+        print(f"{'gazetteer: city+iso2+country lookup':<45} {per_lookup * 1e6:10.3f} us/row")
+
+        print()
+        print(
+            f"Per-row cost in process_format_c: legacy ~{legacy * 2 * 1000:.1f} ms "
+            f"(CSV parsed for City and Country), gazetteer ~{per_lookup * 1e6:.2f} us "
+            f"after a one-off {load * 1000:.1f} ms load."
+        )
+
+
+if __name__ == "__main__":
+    main()
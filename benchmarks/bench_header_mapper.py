@@ -0,0 +1,77 @@
+"""How many header layouts the local mapper resolves without the LLM.
+
+Usage: python -m benchmarks.bench_header_mapper [--repeat N]
+
+Runs map_headers over header rows taken from common supplier formats, checks
+each confident mapping against the expected one and reports the fraction
+resolved locally and the time per mapping. Learned mappings are not used, so
+this is the cold-start figure.
+"""
+import argparse
+import tempfile
+import time
+
+from singtel.process import header_mapper, storage
+from singtel.process.header_mapper import HEADER_MAPPER_THRESHOLD, map_headers
+
+DESIRED_COLUMNS = [
+    "Date", "Item", "Description", "Country", "City", "Supplier", "Quote #",
+    "Currency", "Total Cost", "QTY", "Hours", "Unit Cost", "Unit Cost (USD)",
+]
+
+# (header row, expected non-empty mappings); None means the LLM should decide.
+LAYOUTS = [
+    (["Description", "Qty", "Total Price"],
+     {"Description": "Description", "QTY": "Qty", "Total Cost": "Total Price"}),
+    (["S/N", "Item", "Description", "Qty", "Unit Price (USD)", "Total Price (USD)"],
+     {"Item": "Item", "Description": "Description", "QTY": "Qty",
+      "Unit Cost": "Unit Price (USD)", "Total Cost": "Total Price (USD)"}),
+    (["No.", "Item Description", "Quantity", "Unit Price", "Amount"],
+     {"Description": "Item Description", "QTY": "Quantity",
+      "Unit Cost": "Unit Price", "Total Cost": "Amount"}),
+    (["Service", "Hrs", "Rate", "Total", "Remarks"],
+     {"Item": "Service", "Hours": "Hrs", "Unit Cost": "Rate", "Total Cost": "Total"}),
+    (["Item", "Description", "Currency", "QTY", "Unit Cost", "Total Cost"],
+     {"Item": "Item", "Description": "Description", "Currency": "Currency",
+      "QTY": "QTY", "Unit Cost": "Unit Cost", "Total Cost": "Total Cost"}),
+    (["Sl No", "Product", "Specification", "Qty", "Unit Rate", "Total Amount (SGD)"],
+     {"Item": "Product", "Description": "Specification", "QTY": "Qty",
+      "Unit Cost": "Unit Rate", "Total Cost": "Total Amount (SGD)"}),
+    (["Line #", "Part Number", "Descripton", "QTY", "Ext. Price"], None),
+    (["Item", "Description", "Total", "Total Price"], None),
+    (["Col A", "Col B", "Col C"], None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # Keep learned mappings from a real cache directory out of the figures.
+    storage.CACHE_DIR = tempfile.mkdtemp()
+    header_mapper._learned = None
+
+    local = 0
+    for header, expected in LAYOUTS:
+        mapped, confidence = map_headers(header, DESIRED_COLUMNS)
+        resolved = confidence >= HEADER_MAPPER_THRESHOLD
+        if expected is None:
+            assert not resolved, (header, mapped, confidence)
+        elif resolved:
+            assert {k: v for k, v in mapped.items() if v != ""} == expected, (header, mapped)
+        local += resolved
+        print(f"{'local' if resolved else 'LLM  '} {confidence:5.2f}  {header}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for header, _ in LAYOUTS:
+            map_headers(header, DESIRED_COLUMNS)
+    per_mapping = (time.perf_counter() - start) / (args.repeat * len(LAYOUTS))
+
+    print(f"resolved locally: {local}/{len(LAYOUTS)} layouts ({local / len(LAYOUTS):.0%})")
+    print(f"local mapping: {per_mapping * 1000:.2f} ms per header row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Build, incremental insert, persistence and top-k latency of the line item index.
+
+Usage: python -m benchmarks.bench_line_item_index [--rows N] [--distinct FRACTION]
+           [--k K]
+
+Indexes N synthetic singtel_data rows (default 1,000,000) whose item and
+description texts repeat the way re-quoted line items do (--distinct is the
+share of distinct texts), in sync-sized batches. Then times top-k queries for
+"similar ..." style questions, an incremental insert of 1,000 rows, and
+saving/loading the index file.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from singtel.process.line_item_index import SYNC_BATCH_ROWS, LineItemIndex
+
+ITEMS = [
+    "Cisco Router C9300", "Router ISR 4331", "Firewall Palo Alto PA-440", "Load Balancer F5",
+    "Access Point Aruba 515", "Cat6 Cable 5m", "Support 24x7", "Switch 48 port PoE",
+    "SD-WAN Edge appliance", "Fortinet FortiGate 60F", "Juniper EX4300 switch",
+    "Managed LAN service", "Optical transceiver SFP+", "UPS 3kVA",
+]
+DESCRIPTIONS = [
+    "Hardware supply", "Installation and configuration", "Annual maintenance",
+    "Managed service", "Licence renewal", "On-site support", "Project management",
+]
+QUERIES = [
+    "comparable routers", "similar firewalls", "load balancing", "wireless access points",
+    "alternatives to the 48 port switches", "cabling", "fortigate", "ups battery backup",
+]
+
+
+def synthetic_rows(rows, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = [
+        (f"{rng.choice(ITEMS)} {rng.getrandbits(20):X}", f"{rng.choice(DESCRIPTIONS)} site "
+         f"{rng.randint(1, 5000)}")
+        for _ in range(max(1, int(rows * distinct)))
+    ]
+    picked = [rng.choice(pool) for _ in range(rows)]
+    return list(range(1, rows + 1)), [p[0] for p in picked], [p[1] for p in picked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=float, default=0.2)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    ids, items, descriptions = synthetic_rows(args.rows + 1000, args.distinct)
+    index = LineItemIndex()
+    start = time.perf_counter()
+    for offset in range(0, args.rows, SYNC_BATCH_ROWS):
+        end = min(offset + SYNC_BATCH_ROWS, args.rows)
+        index.add(ids[offset:end], items[offset:end], descriptions[offset:end])
+    elapsed = time.perf_counter() - start
+    print(f"build: {args.rows} rows ({len(index.texts)} distinct texts) in {elapsed:.1f}s, "
+          f"{args.rows / elapsed:.0f} rows/s")
+
+    timings = []
+    for _ in range(5):
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.search(query, k=args.k)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"top-{args.k} query: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms")
+    for query in QUERIES[:3]:
+        best = sorted({line_item for _, _, line_item in index.search(query, k=5)})
+        print(f"  {query!r}: {best[:3]}")
+
+    start = time.perf_counter()
+    index.add(ids[args.rows:], items[args.rows:], descriptions[args.rows:])
+    print(f"incremental insert of 1000 rows: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    path = os.path.join(tempfile.mkdtemp(), "line_item_index.pickle")
+    start = time.perf_counter()
+    index.save(path)
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    LineItemIndex.load(path)
+    print(f"save {saved:.2f}s, load {time.perf_counter() - start:.2f}s, "
+          f"{os.path.getsize(path) / 2**20:.0f} MiB on disk")
+
+
+if __name__ == "__main__":
+    main()
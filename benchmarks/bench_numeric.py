@@ -0,0 +1,74 @@
+"""Throughput of parse_numeric against the old per-cell extract_numeric.
+
+Usage: python -m benchmarks.bench_numeric [--rows N] [--distinct N]
+
+Builds a synthetic Total Cost column of mixed cells (numbers, plain numeric
+strings, formatted amounts) and times both paths, including the second
+pd.to_numeric pass the old path needed.
+"""
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from singtel.process.numeric import parse_numeric
+
+
+def legacy_extract_numeric(value):
+    if isinstance(value, str):
+        match = re.search(r"\d+\.?\d*", value)
+        if match:
+            return float(match.group(0))
+    elif isinstance(value, (int, float)):
+        return value
+    return pd.NA
+
+
+def legacy_parse(series):
+    return pd.to_numeric(series.apply(legacy_extract_numeric), errors="coerce")
+
+
+def synthetic_column(rows, distinct, seed=0):
+    rng = random.Random(seed)
+    formats = [
+        lambda x: x,
+        lambda x: f"{x:.2f}",
+        lambda x: f"${x:,.2f}",
+        lambda x: f"USD {x:,.2f}",
+        lambda x: f"({x:,.2f})",
+        lambda x: f"{x:,.2f}".replace(",", " ").replace(".", ",").replace(" ", "."),
+        lambda x: f"{int(x)} units",
+        lambda x: "",
+    ]
+    pool = [rng.choice(formats)(rng.uniform(0, 100_000)) for _ in range(distinct)]
+    return pd.Series([rng.choice(pool) for _ in range(rows)], dtype=object)
+
+
+def timed(label, fn, rows):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {elapsed:8.2f} s  {rows / elapsed / 1e6:8.2f} M rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, {args.distinct} distinct cell values")
+    column = synthetic_column(args.rows, args.distinct)
+    timed("legacy apply + to_numeric", lambda: legacy_parse(column), args.rows)
+    timed("parse_numeric", lambda: parse_numeric(column), args.rows)
+
+    all_distinct = synthetic_column(args.rows, args.rows, seed=1)
+    print(f"{args.rows} rows, all distinct")
+    timed("legacy apply + to_numeric", lambda: legacy_parse(all_distinct), args.rows)
+    timed("parse_numeric", lambda: parse_numeric(all_distinct), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Repeat-question latency of the Query Data chatbot with the QA caches.
+
+Usage: python -m benchmarks.bench_qa_cache [--repeats N] [--latency SECONDS]
+           [--db-url URL]
+
+Asks a few questions N times each (with varying case, spacing and trailing
+punctuation) through the shared chain, against benchmarks.stub_llm and the
+SQLite table from benchmarks.bench_qa_chain unless --db-url is given. Reports
+the first and repeat answer times and the hit counts of both cache levels.
+Use --latency to give the stub a realistic gpt-4o response time.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.bench_qa_chain import sqlite_url
+from benchmarks.stub_llm import serve
+
+QUESTIONS = [
+    "Average router cost in Singapore?",
+    "How many quotes do we have from Stub Supplier",
+    "Total cost of hardware supply",
+]
+
+
+def variants(question):
+    return [question, question.lower(), f"  {question.upper()} ", question.rstrip("?") + "?"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="seconds the stub LLM takes per call")
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["DB_URL"] = args.db_url or sqlite_url()
+
+    from singtel.process.qa_bot_main import get_qa_chain
+    from singtel.process.qa_cache import get_qa_cache_stats
+
+    get_qa_chain()
+    first, repeat = [], []
+    for question in QUESTIONS:
+        asked = variants(question)
+        for i in range(args.repeats):
+            start = time.perf_counter()
+            for _ in get_qa_chain().stream({"question": asked[i % len(asked)]}):
+                pass
+            (repeat if i else first).append(time.perf_counter() - start)
+
+    print(f"{'first ask':<12} median {statistics.median(first) * 1000:8.1f} ms")
+    print(f"{'repeat ask':<12} median {statistics.median(repeat) * 1000:8.1f} ms")
+    for level, stats in get_qa_cache_stats().items():
+        print(f"{level:<7} cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"hit rate {stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Time to first token of the Query Data chatbot: chain per message vs shared chain.
+
+Usage: python -m benchmarks.bench_qa_chain [--messages N] [--latency SECONDS]
+           [--db-url URL]
+
+Answers N questions through the chain the way the Query Data page does
+(streaming), against benchmarks.stub_llm. The "per message" run builds the
+engine, reflection, LLM, prompts and chain for every question, as
+qa_chatbot_response used to; the "shared" run goes through get_qa_chain.
+Without --db-url a temporary SQLite database with a small singtel_data table
+is used; pass a PostgreSQL SQLAlchemy URL to include real catalog reflection.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_llm import serve
+
+QUESTION = "How many routers did we buy?"
+
+
+def sqlite_url():
+    path = os.path.join(tempfile.mkdtemp(), "singtel.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        """
+        CREATE TABLE singtel_data (
+            id INTEGER PRIMARY KEY, date TIMESTAMP, item VARCHAR(255) NOT NULL,
+            description TEXT, country VARCHAR(255), city VARCHAR(255),
+            supplier VARCHAR(255), quote_id VARCHAR(255), currency VARCHAR(3),
+            total_cost NUMERIC(20, 2), quantity INTEGER, hours INTEGER,
+            unit_cost NUMERIC(20, 2), unit_cost_usd NUMERIC(20, 2)
+        )
+        """
+    )
+    connection.executemany(
+        "INSERT INTO singtel_data (item, description, country, supplier, unit_cost_usd)"
+        " VALUES (?, ?, ?, ?, ?)",
+        [(f"Router {i}", "Hardware supply", "Singapore", "Stub Supplier", 10.0 * i)
+         for i in range(100)],
+    )
+    connection.commit()
+    connection.close()
+    return f"sqlite:///{path}"
+
+
+def first_token_seconds(chain):
+    start = time.perf_counter()
+    first = None
+    for _ in chain.stream({"question": QUESTION}):
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the stub LLM takes per call")
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["DB_URL"] = args.db_url or sqlite_url()
+
+    from singtel.process.qa_bot_main import build_qa_chain, get_qa_chain
+
+    per_message = []
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        built = build_qa_chain(os.environ["DB_URL"])
+        build_seconds = time.perf_counter() - start
+        per_message.append(build_seconds + first_token_seconds(built["chain"]))
+        built["engine"].dispose()
+
+    get_qa_chain()  # the first message of the process pays for the build
+    shared = [first_token_seconds(get_qa_chain()) for _ in range(args.messages)]
+
+    for label, timings in [("chain per message", per_message), ("shared chain", shared)]:
+        print(f"{label:<20} median {statistics.median(timings) * 1000:8.1f} ms  "
+              f"max {max(timings) * 1000:8.1f} ms")
+    print(f"saved per message: "
+          f"{(statistics.median(per_message) - statistics.median(shared)) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
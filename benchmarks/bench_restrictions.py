@@ -0,0 +1,103 @@
+"""Regression check and timing for the post-mapping cleanup rules.
+
+Usage: python -m benchmarks.bench_restrictions [--rows N] [--checks N]
+
+Compares apply_restriction_on_df / apply_restriction_on_c_df with the
+row-by-row implementations they replaced, on random frames shaped like mapped
+quotes (blank rows, zero costs, repeated line items, stray whitespace).
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from singtel.process.utility import apply_restriction_on_c_df, apply_restriction_on_df
+
+
+def legacy_apply_restriction_on_df(new_df):
+    new_df = new_df[new_df["Total Cost"] != 0]
+    drop_index = None
+    count = 0
+    for i, row in new_df.iterrows():
+        if row["Item"].strip() == "" or row["Description"].strip() == "":
+            count += 1
+            if count >= 2:
+                drop_index = i
+                break
+    if drop_index is not None:
+        new_df = new_df.loc[:drop_index]
+    new_df = new_df.drop_duplicates(subset=["Item", "Description"], keep="first")
+    new_df = new_df[
+        ~(
+            (new_df["Item"].astype(str).str.strip() == "")
+            | (new_df["Description"].astype(str).str.strip() == "")
+        )
+    ]
+    return new_df
+
+
+def legacy_apply_restriction_on_c_df(new_df):
+    new_df = new_df[
+        (new_df["Total Cost"] != 0) & (new_df["Total Cost"].astype(str) != "")
+    ]
+    new_df = new_df[
+        ~(
+            (new_df["Item"].astype(str).str.strip() == "")
+            & (new_df["Description"].astype(str).str.strip() == "")
+        )
+    ]
+    return new_df
+
+
+def mapped_quote(rows, seed):
+    rng = random.Random(seed)
+    texts = ["Router", "Router ", "Cabling", "Support 24x7", "", " ", "Install"]
+    return pd.DataFrame(
+        {
+            "Item": [rng.choice(texts) for _ in range(rows)],
+            "Description": [rng.choice(texts) for _ in range(rows)],
+            "Total Cost": [rng.choice([0, 0.0, 10, "12.5", "", "0", 99.9]) for _ in range(rows)],
+            "QTY": [rng.randint(0, 5) for _ in range(rows)],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--checks", type=int, default=500)
+    args = parser.parse_args()
+
+    for seed in range(args.checks):
+        df = mapped_quote(random.Random(seed).randint(0, 40), seed)
+        pd.testing.assert_frame_equal(
+            apply_restriction_on_df(df), legacy_apply_restriction_on_df(df)
+        )
+        pd.testing.assert_frame_equal(
+            apply_restriction_on_c_df(df), legacy_apply_restriction_on_c_df(df)
+        )
+    print(f"{args.checks} random frames: output matches the previous implementation")
+
+    df = mapped_quote(args.rows, seed=0)
+    # Keep Item/Description filled so the legacy loop scans the whole table.
+    df["Item"] = df["Item"].replace({"": "Router", " ": "Router"})
+    df["Description"] = df["Description"].replace({"": "Cabling", " ": "Cabling"})
+    for label, new, old in [
+        ("Template A", apply_restriction_on_df, legacy_apply_restriction_on_df),
+        ("Template C", apply_restriction_on_c_df, legacy_apply_restriction_on_c_df),
+    ]:
+        start = time.perf_counter()
+        old(df)
+        legacy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        new(df)
+        new_seconds = time.perf_counter() - start
+        print(
+            f"{label}, {args.rows} rows: legacy {legacy_seconds * 1000:.1f} ms, "
+            f"columnar {new_seconds * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
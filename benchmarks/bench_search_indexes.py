@@ -0,0 +1,152 @@
+"""Chatbot-style query latency on singtel_data before and after the search indexes.
+
+Usage: python -m benchmarks.bench_search_indexes --dsn DSN [--rows N] [--runs N] [--keep]
+
+Builds singtel_data from migration 1 in a scratch schema (bench_search),
+fills it with N synthetic rows (default 1,000,000) generated server side,
+times the queries the SQL chain prompt produces, then applies the remaining
+migrations and times them again. Each query reports the median of --runs
+executions after one warm-up, and the scan nodes of its plan. The
+scratch schema is dropped afterwards unless --keep is given.
+"""
+import argparse
+import re
+import statistics
+import time
+
+import psycopg2
+
+from singtel.db.migrations import MIGRATIONS, apply_migrations
+
+SCHEMA = "bench_search"
+
+FILL_QUERY = """
+INSERT INTO singtel_data (date, item, description, country, city, supplier, quote_id,
+                          currency, total_cost, quantity, hours, unit_cost, unit_cost_usd)
+SELECT timestamp '2020-01-01' + (i %% 1826) * interval '1 day',
+       CASE WHEN i %% 5000 = 0 THEN 'Load Balancer'
+            ELSE (ARRAY['Router', 'Switch', 'Firewall', 'Access Point', 'Cable', 'Support'])[1 + i %% 6]
+       END || ' ' || upper(substr(md5(i::text), 1, 8)),
+       (ARRAY['Installation and configuration', 'Annual maintenance', 'Hardware supply',
+              'Managed service', 'Licence renewal'])[1 + i %% 5] || ' for site ' || (i %% 10000),
+       'Country ' || (i %% 50),
+       'City ' || (i %% 500),
+       'Supplier ' || (i %% 1000),
+       'Q-' || (i / 20),
+       'USD',
+       round((random() * 10000)::numeric, 2),
+       1 + i %% 10,
+       NULL,
+       round((random() * 1000)::numeric, 2),
+       round((random() * 1000)::numeric, 2)
+FROM generate_series(1, %s) AS i
+"""
+
+# (label, SQL, needs search_vector) in the shape the SQL chain prompt asks for
+QUERIES = [
+    ("ILIKE word in item/description",
+     """SELECT "item", "description", "supplier", "unit_cost_usd", "currency" FROM singtel_data
+        WHERE "item" ILIKE '%balancer%' OR "description" ILIKE '%balancer%' LIMIT 10""", False),
+    ("ILIKE model code in item",
+     """SELECT "item", "supplier", "unit_cost_usd", "currency" FROM singtel_data
+        WHERE "item" ILIKE '%C4CA4238%' LIMIT 10""", False),
+    ("ILIKE aggregate",
+     """SELECT AVG("unit_cost_usd") FROM singtel_data
+        WHERE "item" ILIKE '%balancer%' OR "description" ILIKE '%balancer%'""", False),
+    ("full-text word search",
+     """SELECT "item", "description", "supplier", "unit_cost_usd", "currency" FROM singtel_data
+        WHERE "search_vector" @@ plainto_tsquery('english', 'load balancers') LIMIT 10""", True),
+    ("supplier aggregate",
+     """SELECT AVG("unit_cost_usd"), COUNT(*) FROM singtel_data
+        WHERE lower("supplier") = 'supplier 17'""", False),
+    ("supplier prefix",
+     """SELECT "supplier", COUNT(*) FROM singtel_data
+        WHERE lower("supplier") LIKE 'supplier 17%' GROUP BY "supplier" """, False),
+    ("country count",
+     """SELECT "city", COUNT(*) FROM singtel_data
+        WHERE lower("country") = 'country 7' GROUP BY "city" """, False),
+    ("date range",
+     """SELECT SUM("unit_cost_usd") FROM singtel_data
+        WHERE "date" >= '2024-03-01' AND "date" < '2024-04-01'""", False),
+]
+
+SCAN_PATTERN = re.compile(r"(Parallel Seq Scan|Seq Scan|Bitmap Index Scan on \S+|"
+                          r"Index Only Scan using \S+|Index Scan using \S+)")
+
+
+def time_query(cursor, sql, runs):
+    cursor.execute(sql)
+    cursor.fetchall()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    cursor.execute("EXPLAIN " + sql)
+    plan = "\n".join(row[0] for row in cursor.fetchall())
+    scans = list(dict.fromkeys(SCAN_PATTERN.findall(plan)))
+    return statistics.median(timings), ", ".join(scans)
+
+
+def run_queries(connection, runs, indexed):
+    results = {}
+    with connection.cursor() as cursor:
+        for label, sql, needs_vector in QUERIES:
+            if needs_vector and not indexed:
+                continue
+            results[label] = time_query(cursor, sql, runs)
+    connection.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_search schema")
+    args = parser.parse_args()
+
+    # Unqualified names (and schema_migrations) resolve to the scratch schema
+    connection = psycopg2.connect(args.dsn, options=f"-c search_path={SCHEMA},public")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        connection.commit()
+        apply_migrations(connection, MIGRATIONS[:1])
+
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(FILL_QUERY, (args.rows,))
+            cursor.execute("ANALYZE singtel_data")
+        connection.commit()
+        print(f"Filled {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        before = run_queries(connection, args.runs, indexed=False)
+        start = time.perf_counter()
+        apply_migrations(connection)
+        print(f"Migrations took {time.perf_counter() - start:.1f}s")
+        after = run_queries(connection, args.runs, indexed=True)
+
+        print(f"\n{'query':<32} {'before ms':>10} {'after ms':>10} {'speed-up':>9}  plan after")
+        for label, _, _ in QUERIES:
+            after_seconds, scans = after[label]
+            if label in before:
+                before_seconds = before[label][0]
+                print(f"{label:<32} {before_seconds * 1000:10.1f} {after_seconds * 1000:10.1f} "
+                      f"{before_seconds / after_seconds:8.1f}x  {scans}")
+            else:
+                print(f"{label:<32} {'-':>10} {after_seconds * 1000:10.1f} {'-':>9}  {scans}")
+    finally:
+        if not args.keep:
+            connection.rollback()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.commit()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
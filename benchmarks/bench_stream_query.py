@@ -0,0 +1,101 @@
+"""Peak memory and time of reading a whole table: fetchall vs execute_query vs stream_query.
+
+Usage: python -m benchmarks.bench_stream_query --dsn DSN [--rows N] [--chunk-rows N] [--keep]
+
+Fills singtel_data in a scratch schema (bench_stream) with N synthetic rows
+(default 1,000,000), then reads all of them in a fresh process per mode:
+the old client-side fetchall into a DataFrame, execute_query and iterating
+stream_query chunks. Reports each process's peak RSS above what it used
+before the query. The scratch schema is dropped
+afterwards unless --keep is given.
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+import psycopg2
+
+from benchmarks.bench_search_indexes import FILL_QUERY
+from singtel.db.migrations import MIGRATIONS, apply_migrations
+
+SCHEMA = "bench_stream"
+MODES = ["fetchall", "execute_query", "stream_query"]
+QUERY = "SELECT * FROM singtel_data ORDER BY id"
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_table(dsn, mode, chunk_rows):
+    """Child process: read the table one way and print rows, seconds and MiB."""
+    import pandas as pd
+
+    from singtel.db.db_connection import execute_query, stream_query
+
+    connection = psycopg2.connect(dsn, options=f"-c search_path={SCHEMA},public")
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    if mode == "fetchall":
+        with connection.cursor() as cursor:
+            cursor.execute(QUERY)
+            rows = cursor.fetchall()
+            frame = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+        total = len(frame)
+    elif mode == "execute_query":
+        total = len(execute_query(connection, QUERY))
+    else:
+        total = sum(len(chunk) for chunk in stream_query(connection, QUERY, chunk_rows=chunk_rows))
+    elapsed = time.perf_counter() - start
+    print(total, elapsed, peak_rss_mib() - baseline)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_stream schema")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        read_table(args.dsn, args.mode, args.chunk_rows)
+        return
+
+    # Unqualified names resolve to the scratch schema
+    connection = psycopg2.connect(args.dsn, options=f"-c search_path={SCHEMA},public")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        connection.commit()
+        apply_migrations(connection, MIGRATIONS[:1])
+        with connection.cursor() as cursor:
+            cursor.execute(FILL_QUERY, (args.rows,))
+        connection.commit()
+
+        print(f"{'mode':<14} {'rows':>9} {'seconds':>8} {'peak MiB':>9}")
+        for mode in MODES:
+            command = [sys.executable, "-m", "benchmarks.bench_stream_query", "--dsn", args.dsn,
+                       "--mode", mode]
+            if args.chunk_rows:
+                command += ["--chunk-rows", str(args.chunk_rows)]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            rows, seconds, mib = output.split()[-3:]
+            print(f"{mode:<14} {int(rows):>9} {float(seconds):8.2f} {float(mib):9.0f}")
+    finally:
+        if not args.keep:
+            connection.rollback()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.commit()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
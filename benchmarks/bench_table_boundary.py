@@ -0,0 +1,89 @@
+"""Compare vectorized get_end_of_table with the old iterrows scan.
+
+Usage: python -m benchmarks.bench_table_boundary [--rows N] [--cols N]
+
+Builds synthetic sheets shaped like quotes (title block, table, blank gap,
+footer), checks both implementations agree and times them.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from singtel.process.utility import get_end_of_table, get_table_blocks
+
+
+def legacy_get_end_of_table(df, header_row):
+    df = df.iloc[header_row:]
+    threshold = 2
+    empty_row_count = 0
+    end_row = df.index[-1]
+    for index, row in df.iterrows():
+        if row.isnull().all() or all(row.astype(str).str.strip() == ""):
+            empty_row_count += 1
+            if empty_row_count >= threshold:
+                end_row = index - threshold + 1
+                break
+        else:
+            empty_row_count = 0
+    return end_row
+
+
+def synthetic_sheet(rows, cols, seed, fill_na=False):
+    rng = random.Random(seed)
+    table_rows = rng.randint(rows // 2, rows - 10)
+    data = []
+    previous_blank = False
+    for i in range(rows):
+        if i < 3:
+            row = [f"title {i}"] + [""] * (cols - 1)
+        elif 3 + table_rows <= i < 3 + table_rows + 3:
+            row = [" "] * cols  # blank gap closing the table
+        elif not previous_blank and rng.random() < 0.05:
+            row = [""] * cols  # single blank row inside the table
+        else:
+            row = [rng.choice([f"item {i}", 12.5, i, "  x  "]) for _ in range(cols)]
+        previous_blank = row[-1] == ""
+        data.append(row)
+    df = pd.DataFrame(data, columns=[f"c{j}" for j in range(cols)])
+    if fill_na:
+        df = df.replace({"": np.nan, " ": np.nan})
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=15)
+    parser.add_argument("--checks", type=int, default=200)
+    args = parser.parse_args()
+
+    for seed in range(args.checks):
+        df = synthetic_sheet(random.Random(seed).randint(20, 80), 4, seed, fill_na=seed % 2)
+        header = random.Random(seed).randint(0, 5)
+        assert get_end_of_table(df, header) == legacy_get_end_of_table(df, header), seed
+    print(f"{args.checks} random sheets: results match the iterrows implementation")
+
+    df = synthetic_sheet(args.rows, args.cols, seed=0)
+    df.iloc[-5:] = "tail"  # no early exit for the legacy scan before the gap
+    start = time.perf_counter()
+    legacy = legacy_get_end_of_table(df, 3)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = get_end_of_table(df, 3)
+    vectorized_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    blocks = get_table_blocks(df)
+    blocks_seconds = time.perf_counter() - start
+    assert legacy == vectorized
+
+    print(f"{args.rows} x {args.cols} sheet, table ends at row {vectorized}")
+    print(f"legacy iterrows     {legacy_seconds * 1000:10.1f} ms")
+    print(f"vectorized          {vectorized_seconds * 1000:10.1f} ms")
+    print(f"all table blocks    {blocks_seconds * 1000:10.1f} ms  -> {blocks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Deterministic stand-in for the OpenAI chat completions endpoint.
+
+Usage: python -m benchmarks.stub_llm [--port N] [--latency SECONDS]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:PORT and any
+OPENAI_API_KEY. Header mapping prompts are answered with the local header
+mapper's best guess, rest-of-page prompts with fixed quote details,
+Template B extraction prompts with a one-line CSV and the chatbot's SQL and
+answer prompts with a fixed query and reply, so every processor and the
+Query Data chain can run end to end without network access or cost.
+Requests with "stream": true are answered as server-sent events.
+"""
+import argparse
+import ast
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from singtel.process.header_mapper import map_headers
+
+DESIRED_COLUMNS = [
+    "Date", "Item", "Description", "Country", "City", "Supplier", "Quote #",
+    "Currency", "Total Cost", "QTY", "Hours", "Unit Cost", "Unit Cost (USD)",
+]
+REST_DATA_ANSWER = {
+    "Date": "01-Jan-2024",
+    "Supplier": "Stub Supplier",
+    "Quote #": "Q-STUB",
+    "Currency": "USD",
+    "Country": "Singapore",
+    "City": "Singapore",
+}
+CSV_ANSWER = (
+    ",".join(f'"{column}"' for column in DESIRED_COLUMNS)
+    + '\n"01-Jan-2024","Support","Stub line","Singapore","Singapore","Stub Supplier",'
+    '"Q-STUB","USD","100","2","","50","50"'
+)
+
+
+def answer(prompt):
+    if "sample_raw_data" in prompt:
+        match = re.search(r"header: (\[.*\])", prompt)
+        try:
+            header = ast.literal_eval(match.group(1)) if match else []
+        except (ValueError, SyntaxError):
+            header = []
+        return str(map_headers(header, DESIRED_COLUMNS)[0])
+    if "suppliers:" in prompt:
+        return str(REST_DATA_ANSWER)
+    if "csv format" in prompt:
+        return CSV_ANSWER
+    if "SQLQuery:" in prompt:
+        return "SQLQuery: SELECT COUNT(*) FROM singtel_data"
+    if "properly answer the user's question" in prompt:
+        return "There are stub rows in singtel_data."
+    return "{}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+        time.sleep(self.latency)
+        content = answer(prompt)
+        if body.get("stream"):
+            self._send_stream(body, content)
+            return
+        payload = json.dumps(
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, body, content):
+        words = content.split(" ")
+        pieces = [word + " " for word in words[:-1]] + words[-1:]
+        events = []
+        for piece, finish in [(p, None) for p in pieces] + [(None, "stop")]:
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {} if piece is None else {"role": "assistant", "content": piece},
+                        "finish_reason": finish,
+                    }
+                ],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        events.append("data: [DONE]\n\n")
+        payload = "".join(events).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(port=0, latency=0.0):
+    """Start the stub in a daemon thread; returns the server (``server_port``)."""
+    handler = type("Handler", (StubHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = serve(args.port, args.latency)
+    print(f"Stub LLM on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,38 @@
 import os
+import uuid
+from time import sleep
+
 import streamlit as st
 import pandas as pd
-import numpy as np
 
 from navigation import make_sidebar
-from singtel.process.main import process_format_a, process_format_b, process_format_c
-from singtel.db.db_connection import connect_to_db, insert_data
+from singtel.process.jobs import (
+    ACTIVE_STATUSES,
+    DONE,
+    FAILED,
+    list_jobs,
+    load_job_result,
+    mark_job_reviewed,
+    submit_job,
+)
+from singtel.db.db_connection import connect_to_db, copy_data
+from singtel.process.header_mapper import remember_header_mappings
+from singtel.process.line_item_index import db_row_reader, refresh_line_item_index_in_background
 from utilities import use_header
 
 # Progress bar for steps
 pd.set_option('future.no_silent_downcasting', True)
 steps = ["First", "Second", "Third"]
 step_descriptions = ["Upload", "View & Update", "Success"]
-column_mapping = {
-    'Item': 'item',
-    'Description': 'description',
-    'Total Cost': 'total_cost',
-    'QTY': 'quantity',
-    'Date': 'date',
-    'Country': 'country',
-    'City': 'city',
-    'Supplier': 'supplier',
-    'Quote #': 'quote_id',
-    'Currency': 'currency',
-    'Hours': 'hours',
-    'Unit Cost': 'unit_cost',
-    'Unit Cost (USD)': 'unit_cost_usd'
-}
+# Seconds between refreshes of the processing queue while jobs are running
+JOB_POLL_SECONDS = 2
 connection = connect_to_db()
 
-
-def replace_empty_with_none(df):
-    """Replace empty strings with None (NULL) in a DataFrame."""
-    df.replace("", np.nan, inplace=True)
-    df = df.where(pd.notnull(df), None)
-    return df
+# Jobs belong to the browser session that uploaded them; other sessions never
+# list them. The token rides along in the URL so a reload or reconnect, which
+# starts a new Streamlit session (and goes through the login page), keeps it.
+if "job_owner" not in st.session_state:
+    st.session_state.job_owner = st.query_params.get("owner") or uuid.uuid4().hex
 
 
 def show_progress_bar(current_step, steps, step_descriptions):
@@ -111,35 +109,63 @@ use_header()
 
 # show sidebar
 make_sidebar()
+st.query_params["owner"] = st.session_state.job_owner
 
 # Show progress bar
 show_progress_bar(st.session_state.current_step - 1, steps, step_descriptions)
 
 if st.session_state.current_step == 1:
-    with st.form("upload_form"):
+    with st.form("upload_form", clear_on_submit=True):
         st.markdown("#### Select Template")
         template = st.selectbox("Select Template", ["Template A", "Template B", "Template C"], key="template")
-        uploaded_file = st.file_uploader("Choose file", type=["xls", "xlsx"], key="file")
+        uploaded_files = st.file_uploader("Choose files", type=["xls", "xlsx"], key="file",
+                                          accept_multiple_files=True)
         submitted = st.form_submit_button("Upload")
 
         if submitted:
-            if uploaded_file is None:
+            if not uploaded_files:
                 st.error("Please upload a file before proceeding.")
             else:
-                with st.spinner(text="In progress..."):
-                    if template == "Template A":
-                        response = process_format_a(uploaded_file)
-                    elif template == "Template B":
-                        response = process_format_b(uploaded_file)
-                    elif template == "Template C":
-                        response = process_format_c(uploaded_file)
-
-                st.session_state.uploaded_file = response
-                st.success("File uploaded successfully!")
-                st.session_state.current_step = 2
-                st.query_params['step'] = st.session_state.current_step
+                # Processing runs in the background; an identical file already
+                # in flight is not queued again.
+                for uploaded_file in uploaded_files:
+                    submit_job(uploaded_file, template, st.session_state.job_owner)
+                st.success(f"{len(uploaded_files)} file(s) queued for processing.")
+
+    jobs = list_jobs(st.session_state.job_owner)
+    if jobs:
+        st.markdown("#### Processing queue")
+    for job in jobs:
+        label = f"{job['file_name']} ({job['template']})"
+        col1, col2, col3 = st.columns([8, 1, 1], vertical_alignment="center")
+        with col1:
+            if job["status"] == FAILED:
+                st.error(f"{label}: {job['error']}")
+            else:
+                st.progress(job["progress"], text=f"{label} - {job['stage']}")
+        with col2:
+            if job["status"] == DONE and st.button("Review", key=f"review_{job['id']}"):
+                try:
+                    response = load_job_result(job["id"])
+                except OSError:
+                    st.error(f"{label}: the processed result is no longer available, please upload again")
+                else:
+                    # The job stays listed until its rows are inserted or it is dismissed
+                    st.session_state.job_id = job["id"]
+                    st.session_state.uploaded_file = response
+                    st.session_state.header_mappings = response.attrs.get("header_mappings", [])
+                    st.session_state.current_step = 2
+                    st.query_params['step'] = st.session_state.current_step
+                    st.rerun()
+        with col3:
+            if job["status"] in (DONE, FAILED) and st.button("Dismiss", key=f"dismiss_{job['id']}"):
+                mark_job_reviewed(job["id"])
                 st.rerun()
 
+    if any(job["status"] in ACTIVE_STATUSES for job in jobs):
+        sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
 elif st.session_state.current_step == 2:
     # Display uploaded data
     if st.session_state.uploaded_file is not None:
@@ -156,22 +182,21 @@ elif st.session_state.current_step == 2:
             response = None
             if st.button("Next"):
                 with st.spinner(text="In progress..."):
-                    df_rearranged = df.rename(columns=column_mapping)
-                    df_rearranged = df_rearranged[list(column_mapping.values())]
-                    df_rearranged['quantity'] = pd.to_numeric(df_rearranged['quantity'].replace('', np.nan),
-                                                                errors='coerce')
-                    df_rearranged['hours'] = pd.to_numeric(df_rearranged['hours'].replace('', np.nan),
-                                                            errors='coerce')
-                    df_rearranged = replace_empty_with_none(df_rearranged)
-                    st.session_state.records = len(df_rearranged)
-                    for col in df_rearranged.columns:
-                        df_rearranged[col] = df_rearranged[col].map(lambda x: None if pd.isna(x) else x)
-                    data_tuples = df_rearranged.to_records(index=False).tolist()
-                    response = insert_data(connection, data_tuples)
+                    st.session_state.records = len(df)
+                    # One transaction: a failed upload leaves nothing behind to duplicate on retry
+                    response = copy_data(connection, df, batch_size=None)
                     if response.startswith("Error"):
                         error_placeholder.empty()
                         error_placeholder.error(response)
                     else:
+                        # Inserted: the job's stored result is no longer needed
+                        if st.session_state.get("job_id"):
+                            mark_job_reviewed(st.session_state.job_id)
+                            st.session_state.job_id = None
+                        # Accepted upload: reuse its header mappings next time
+                        remember_header_mappings(st.session_state.get("header_mappings", []))
+                        # Index the new rows for similar-item questions, off the request path
+                        refresh_line_item_index_in_background(db_row_reader(connection))
                         st.session_state.current_step = 3
                         st.rerun()
 
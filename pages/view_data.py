@@ -1,7 +1,9 @@
+import psycopg2
 import streamlit as st
 
 from navigation import make_sidebar
-from singtel.db.db_connection import connect_to_db, execute_query, drop_all_data
+from singtel.db.db_connection import connect_to_db, drop_all_data
+from singtel.db.pagination import SORTABLE_COLUMNS, count_rows, export_csv, fetch_page
 from utilities import use_header
 
 # show header
@@ -12,8 +14,33 @@ make_sidebar()
 
 # connect to db
 connection = connect_to_db()
-select_query = "SELECT * FROM singtel_data;"
-df = execute_query(connection, select_query)
+rows_per_page = 10
+
+# Filters and sort run in the query; only the requested page is fetched
+col1, col2, col3 = st.columns([6, 3, 1], vertical_alignment="bottom")
+with col1:
+    search = st.text_input("Search item, description or supplier")
+with col2:
+    sort_column = st.selectbox("Sort by", SORTABLE_COLUMNS)
+with col3:
+    descending = st.checkbox("Desc")
+
+# Keyset pagination: a stack of the cursors that start each visited page.
+# Changing the filters or sort starts again from the first page.
+view_key = (search, sort_column, descending)
+if st.session_state.get("view_key") != view_key:
+    st.session_state.view_key = view_key
+    st.session_state.page_cursors = [None]
+page_cursors = st.session_state.page_cursors
+
+df, next_cursor = fetch_page(
+    connection,
+    rows_per_page,
+    cursor=page_cursors[-1],
+    sort_column=sort_column,
+    descending=descending,
+    search=search,
+)
 
 if df is not None and not df.empty:
     st.write("### SingTel Data")
@@ -25,37 +52,44 @@ if df is not None and not df.empty:
                 error_placeholder.empty()
                 error_placeholder.error(response)
             else:
+                st.session_state.page_cursors = [None]
                 st.rerun()
 
-    rows_per_page = 10
-    total_rows = len(df)
-    total_pages = (total_rows - 1) // rows_per_page + 1
-
-    # Initialize session state for pagination if not already done
-    if "page_number" not in st.session_state:
-        st.session_state.page_number = 1
-
-    # Calculate the start and end indices of the rows to display
-    start_idx = (st.session_state.page_number - 1) * rows_per_page
-    end_idx = start_idx + rows_per_page
+    total_rows, estimated = count_rows(connection, search=search)
+    total_pages = max((total_rows - 1) // rows_per_page + 1, len(page_cursors))
+    page_number = len(page_cursors)
 
     # Display the rows for the current page
-    st.dataframe(df.iloc[start_idx:end_idx])
+    st.dataframe(df, hide_index=True)
+
+    # The export is built only on request, streamed from the database
+    if st.button("Export CSV"):
+        with st.spinner(text="Preparing export..."):
+            try:
+                csv = export_csv(connection, sort_column, descending, search=search)
+            except psycopg2.DatabaseError as e:
+                st.error(f"Error: {e}")
+            else:
+                st.download_button("Download CSV", csv, file_name="singtel_data.csv",
+                                   mime="text/csv")
 
     col1, col2, col3 = st.columns([2, 7, 1])
     with col1:
-        if st.button("Previous") and st.session_state.page_number > 1:
-            st.session_state.page_number -= 1
+        if st.button("Previous") and page_number > 1:
+            page_cursors.pop()
             st.rerun()
     with col3:
-        if st.button("Next  ") and st.session_state.page_number < total_pages:
-            st.session_state.page_number += 1
+        if st.button("Next  ") and next_cursor is not None:
+            page_cursors.append(next_cursor)
             st.rerun()
 
     with col2:
+        approx = "~" if estimated else ""
         st.markdown(
-            f"<div style='text-align: center;font-weight:bold;'>Page {st.session_state.page_number}<span style='font-weight:normal;'> of </span>{total_pages}</div>",
+            f"<div style='text-align: center;font-weight:bold;'>Page {page_number}<span style='font-weight:normal;'> of </span>{approx}{total_pages}</div>",
             unsafe_allow_html=True,
         )
+elif search:
+    st.warning("No rows match the search.")
 else:
     st.warning("No Data Found, Please upload a file first on the Upload page.")
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Connections idle longer than this are pinged before being handed out
+DB_POOL_CHECK_AFTER = float(os.environ.get("DB_POOL_CHECK_AFTER", "30"))
+
+
+class PoolTimeoutError(pool.PoolError):
+    """No connection became free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Process-wide PostgreSQL pool shared by every page, session and rerun.
+
+    Wraps psycopg2's ThreadedConnectionPool, which raises as soon as it is
+    exhausted, with a semaphore so callers wait (up to ``timeout``) for a free
+    connection instead. Closed connections, and idle ones that fail a
+    ``SELECT 1``, are replaced on checkout. Connections go back to the pool
+    with any open transaction rolled back.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 **connect_kwargs):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "reconnects": 0,
+        }
+
+    def _is_healthy(self, connection):
+        if connection.closed:
+            return False
+        now = time.monotonic()
+        idle = now - self._last_used.get(id(connection), now)
+        if idle < DB_POOL_CHECK_AFTER:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(
+                f"No database connection free after {self.timeout:g}s "
+                f"({self.maxconn} in use)"
+            )
+        waited = time.monotonic() - start
+        try:
+            connection = self._pool.getconn()
+            # After a server restart every idle connection is stale, replace them all
+            for _ in range(self.maxconn):
+                if self._is_healthy(connection):
+                    break
+                self._pool.putconn(connection, close=True)
+                connection = self._pool.getconn()
+                with self._lock:
+                    self._stats["reconnects"] += 1
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return connection
+
+    def putconn(self, connection, close=False):
+        try:
+            if not close and not connection.closed:
+                if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            close = True
+        close = close or bool(connection.closed)
+        self._last_used.pop(id(connection), None)
+        if not close:
+            self._last_used[id(connection)] = time.monotonic()
+        try:
+            self._pool.putconn(connection, close=close)
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block."""
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def stats(self):
+        """Checkout counts, connections in use and time spent waiting for one."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_size"] = self.maxconn
+        stats["avg_wait_seconds"] = (
+            stats["wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        """Close every connection; a later get_pool() builds a new pool."""
+        with _pools_lock:
+            for key in [key for key, value in _pools.items() if value is self]:
+                del _pools[key]
+        self._pool.closeall()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, **connect_kwargs):
+    """The pool for ``key`` (one per set of credentials), created on first use.
+
+    Raises psycopg2.OperationalError when the first connections cannot be
+    opened; nothing is cached then, so the next call retries.
+    """
+    if key not in _pools:
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ConnectionPool(**connect_kwargs)
+    return _pools[key]
+
+
+def get_pool_stats():
+    """Stats of every pool in the process, by key."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {key: connection_pool.stats() for key, connection_pool in pools.items()}
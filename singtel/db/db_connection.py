@@ -1,97 +1,299 @@
+import itertools
+import logging
 import os
+import time
+from contextlib import contextmanager
+from io import StringIO
+
 import streamlit as st
 
+import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2 import OperationalError
 
+from .connection_pool import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+
+# Processor output columns -> singtel_data columns, in insert_data order
+COLUMN_MAPPING = {
+    'Item': 'item',
+    'Description': 'description',
+    'Total Cost': 'total_cost',
+    'QTY': 'quantity',
+    'Date': 'date',
+    'Country': 'country',
+    'City': 'city',
+    'Supplier': 'supplier',
+    'Quote #': 'quote_id',
+    'Currency': 'currency',
+    'Hours': 'hours',
+    'Unit Cost': 'unit_cost',
+    'Unit Cost (USD)': 'unit_cost_usd'
+}
+INTEGER_COLUMNS = ['quantity', 'hours']
+NUMERIC_COLUMNS = ['total_cost', 'unit_cost', 'unit_cost_usd']
+# Rows per COPY statement and commit when bulk loading
+COPY_BATCH_ROWS = int(os.environ.get("COPY_BATCH_ROWS", "50000"))
+# Rows fetched per round trip by the server-side cursors of stream_query
+QUERY_CHUNK_ROWS = int(os.environ.get("QUERY_CHUNK_ROWS", "10000"))
+
+_cursor_ids = itertools.count(1)
+
+# Bumped on every successful write to singtel_data from this process, so
+# caches of query results can tell they are stale.
+_data_version = 0
+
 
-def connect_to_db():
-    if st.secrets['is_local']:
-        cred_prefix = "local_db"
+def get_data_version():
+    return _data_version
+
+
+def _bump_data_version():
+    global _data_version
+    _data_version += 1
+
+
+def connect_to_db(dsn=None):
+    """The process-wide connection pool for the Streamlit secrets, or for ``dsn``.
+
+    Pages call this on every rerun; they all get the same pool, and each
+    insert_data / copy_data / execute_query / drop_all_data call borrows a
+    connection from it only for its own duration. Returns None when the
+    database cannot be reached.
+    """
+    if dsn:
+        connect_kwargs = {"dsn": dsn}
     else:
-        cred_prefix = "server_db"
+        if st.secrets['is_local']:
+            cred_prefix = "local_db"
+        else:
+            cred_prefix = "server_db"
 
-    dbname = st.secrets[cred_prefix]['DB_NAME']
-    user = st.secrets[cred_prefix]['DB_USER']
-    password = st.secrets[cred_prefix]['DB_PASSWORD']
-    host = st.secrets[cred_prefix]['DB_HOST']
-    port = st.secrets[cred_prefix]['DB_PORT']
+        connect_kwargs = {
+            "dbname": st.secrets[cred_prefix]['DB_NAME'],
+            "user": st.secrets[cred_prefix]['DB_USER'],
+            "password": st.secrets[cred_prefix]['DB_PASSWORD'],
+            "host": st.secrets[cred_prefix]['DB_HOST'],
+            "port": st.secrets[cred_prefix]['DB_PORT'],
+        }
 
     try:
-        connection = psycopg2.connect(
-            dbname=dbname, user=user, password=password, host=host, port=port
-        )
-
-        return connection
+        return get_pool(dsn or cred_prefix, **connect_kwargs)
     except OperationalError as e:
         print(f"Error while connecting to PostgreSQL: {e}")
         return None
 
 
+@contextmanager
+def borrow_connection(connection):
+    """A psycopg2 connection for one operation.
+
+    ``connection`` is either a ConnectionPool (checked out and returned
+    around the block) or a plain psycopg2 connection, used as is.
+    """
+    if isinstance(connection, ConnectionPool):
+        with connection.connection() as pooled:
+            yield pooled
+    else:
+        yield connection
+
+
+def dataframe_to_records(df):
+    """Rows of a processed DataFrame as insert_data tuples, blanks as NULL."""
+    df = df.rename(columns=COLUMN_MAPPING)
+    df = df[list(COLUMN_MAPPING.values())].copy()
+    df['quantity'] = pd.to_numeric(df['quantity'].replace('', np.nan), errors='coerce')
+    df['hours'] = pd.to_numeric(df['hours'].replace('', np.nan), errors='coerce')
+    df = df.replace("", np.nan)
+    df = df.where(pd.notnull(df), None)
+    for col in df.columns:
+        df[col] = df[col].map(lambda x: None if pd.isna(x) else x)
+    return df.to_records(index=False).tolist()
+
+
 def insert_data(connection, data):
     insert_query = """
     INSERT INTO singtel_data (item, description, total_cost, quantity, date, country, city, supplier, quote_id, currency, hours, unit_cost, unit_cost_usd)
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
     """
-    cursor = None
     try:
-        cursor = connection.cursor()
-        cursor.executemany(insert_query, data)
-        connection.commit()
+        with borrow_connection(connection) as conn, conn.cursor() as cursor:
+            cursor.executemany(insert_query, data)
+            conn.commit()
+        _bump_data_version()
         print("Data inserted successfully into PostgreSQL")
         return "Success: Data inserted successfully into PostgreSQL"
     except (Exception, psycopg2.DatabaseError) as error:
         return f"Error: {error}"
-    finally:
-        if cursor is not None:
-            cursor.close()
+
+
+def prepare_copy_frame(df):
+    """Processor output as singtel_data columns with COPY-ready types.
+
+    Coercion happens per column: integer and numeric columns go through
+    pd.to_numeric (unparseable values and infinities, e.g. a unit cost over a
+    zero quantity, become NULL), empty strings and NaN become NULL.
+    """
+    df = df.rename(columns=COLUMN_MAPPING)
+    columns = {}
+    for col in COLUMN_MAPPING.values():
+        values = df[col]
+        if col in INTEGER_COLUMNS or col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(values, errors='coerce').replace([np.inf, -np.inf], np.nan)
+            if col in INTEGER_COLUMNS:
+                values = values.round().astype('Int64')
+        else:
+            values = values.mask(values.eq(""))
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def copy_data(connection, df, table_name="singtel_data", batch_size=COPY_BATCH_ROWS):
+    """Bulk load a processed DataFrame with COPY ... FROM STDIN.
+
+    Rows are streamed as CSV in batches of ``batch_size``, each batch committed
+    on its own; ``batch_size=None`` loads everything in a single transaction.
+    Batching is not atomic: when a later batch fails, the batches before it
+    stay committed and loading the same frame again duplicates them, so
+    callers that report failure to a user who may retry should pass None.
+    Returns a "Success: ..." / "Error: ..." message like insert_data.
+    """
+    frame = prepare_copy_frame(df)
+    copy_query = (
+        f"COPY {table_name} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)"
+    )
+    batch_size = batch_size or max(len(frame), 1)
+    start = time.perf_counter()
+    try:
+        with borrow_connection(connection) as conn, conn.cursor() as cursor:
+            try:
+                for offset in range(0, len(frame), batch_size):
+                    buffer = StringIO()
+                    # NULL is an unquoted empty field in CSV COPY, which is how NaN/NA are written
+                    frame.iloc[offset:offset + batch_size].to_csv(buffer, header=False, index=False)
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_query, buffer)
+                    conn.commit()
+                    _bump_data_version()
+            except Exception:
+                conn.rollback()
+                raise
+        elapsed = time.perf_counter() - start
+        rate = len(frame) / elapsed if elapsed else 0.0
+        print(f"Copied {len(frame)} rows into {table_name} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return f"Success: {len(frame)} rows loaded into PostgreSQL ({rate:.0f} rows/s)"
+    except (Exception, psycopg2.DatabaseError) as error:
+        return f"Error: {error}"
+
+
+def _stream_chunks(connection, query, data, chunk_rows, max_rows):
+    """(column names, rows) chunks of a SELECT read through a server-side cursor.
+
+    Yields at least once, possibly with no rows, and nothing past ``max_rows``.
+    """
+    chunk_rows = chunk_rows or QUERY_CHUNK_ROWS
+    rows_left = max_rows
+    with borrow_connection(connection) as conn:
+        # A named cursor only sends ``chunk_rows`` rows per fetchmany instead of the
+        # whole result; outside a transaction it has to be declared WITH HOLD.
+        with conn.cursor(name=f"stream_query_{next(_cursor_ids)}",
+                         withhold=conn.autocommit) as cursor:
+            cursor.itersize = chunk_rows
+            cursor.execute(query, data or None)
+            first = True
+            while True:
+                size = chunk_rows if rows_left is None else min(chunk_rows, rows_left)
+                # Named cursors only describe their columns after a fetch, so even
+                # max_rows=0 fetches (and drops) a row
+                rows = cursor.fetchmany(size or 1)[:size]
+                if first or rows:
+                    yield [desc[0] for desc in cursor.description], rows
+                    first = False
+                if rows_left is not None:
+                    rows_left -= len(rows)
+                if len(rows) < size or rows_left == 0:
+                    return
+
+
+def stream_query(connection, query, data=None, chunk_rows=None, max_rows=None,
+                 max_bytes=None):
+    """Results of a SELECT as DataFrames of at most ``chunk_rows`` rows.
+
+    Rows come from a server-side cursor ``chunk_rows`` (QUERY_CHUNK_ROWS) at
+    a time, so neither libpq nor Python ever hold more than one chunk. At
+    least one DataFrame is yielded, empty if the query has no rows, so the
+    columns are always known. Stops after ``max_rows`` rows or about
+    ``max_bytes`` bytes of DataFrame memory (memory_usage(deep=True) of the
+    chunks). A borrowed pool connection is returned once the generator is
+    exhausted or closed. Database errors are raised.
+    """
+    bytes_left = max_bytes
+    for columns, rows in _stream_chunks(connection, query, data, chunk_rows, max_rows):
+        frame = pd.DataFrame(rows, columns=columns)
+        if bytes_left is not None and rows:
+            frame_bytes = int(frame.memory_usage(deep=True, index=False).sum())
+            if frame_bytes > bytes_left:
+                # Keep as many rows as fit at the chunk's average row size
+                yield frame.iloc[:bytes_left * len(frame) // frame_bytes]
+                logger.warning(f"Query result cut off at max_bytes={max_bytes}")
+                return
+            bytes_left -= frame_bytes
+        yield frame
+
+
+def stream_rows(connection, query, data=None, chunk_rows=None, max_rows=None):
+    """Result rows of a SELECT as the tuples psycopg2 returns, one at a time.
+
+    Read ``chunk_rows`` at a time like stream_query, without building DataFrames.
+    """
+    for _, rows in _stream_chunks(connection, query, data, chunk_rows, max_rows):
+        yield from rows
 
 
 def execute_query(connection, query, data=None):
-    """Execute a query and return data if it's a SELECT query."""
-    cursor = None
+    """Execute a query and return data if it's a SELECT query.
+
+    The whole result is fetched at once, which suits pages and counts; read
+    large results with stream_query instead.
+    """
     result = None
     try:
-        cursor = connection.cursor()
-        if data:
-            cursor.execute(query, data)
-        else:
-            cursor.execute(query)
-
-        # Check if the query is a SELECT statement
-        if query.strip().upper().startswith("SELECT"):
-            # Fetch all results
-            result = cursor.fetchall()
-            # Get column names
-            column_names = [desc[0] for desc in cursor.description]
-            # Create DataFrame
-            result = pd.DataFrame(result, columns=column_names)
-
-        # Commit for queries that modify the database
-        if not query.strip().upper().startswith("SELECT"):
-            connection.commit()
-            print("Query executed successfully")
+        with borrow_connection(connection) as conn, conn.cursor() as cursor:
+            if data:
+                cursor.execute(query, data)
+            else:
+                cursor.execute(query)
+
+            # Check if the query is a SELECT statement
+            if query.strip().upper().startswith("SELECT"):
+                # Fetch all results
+                result = cursor.fetchall()
+                # Get column names
+                column_names = [desc[0] for desc in cursor.description]
+                # Create DataFrame
+                result = pd.DataFrame(result, columns=column_names)
+
+            # Commit for queries that modify the database
+            if not query.strip().upper().startswith("SELECT"):
+                conn.commit()
+                print("Query executed successfully")
 
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Error while executing query: {error}")
-    finally:
-        if cursor is not None:
-            cursor.close()
 
     return result
 
 def drop_all_data(connection, table_name):
     drop_query = f"TRUNCATE TABLE {table_name} RESTART IDENTITY CASCADE;"
-    cursor = None
     try:
-        cursor = connection.cursor()
-        cursor.execute(drop_query)
-        connection.commit()
+        with borrow_connection(connection) as conn, conn.cursor() as cursor:
+            cursor.execute(drop_query)
+            conn.commit()
+        _bump_data_version()
         print(f"All data removed successfully from table {table_name}")
         return f"Success: All data removed successfully from table {table_name}"
     except (Exception, psycopg2.DatabaseError) as error:
         return f"Error: {error}"
-    finally:
-        if cursor is not None:
-            cursor.close()
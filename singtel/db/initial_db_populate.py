@@ -4,6 +4,8 @@ import psycopg2
 import streamlit as st
 from dotenv import load_dotenv
 
+from singtel.db.migrations import apply_migrations
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -20,47 +22,22 @@ password = st.secrets[cred_prefix]['DB_PASSWORD']
 host = st.secrets[cred_prefix]['DB_HOST']
 port = st.secrets[cred_prefix]['DB_PORT']
 
-# SQL command to create the table
-create_table_query = """
-CREATE TABLE singtel_data (
-    id SERIAL PRIMARY KEY,
-    date TIMESTAMP,
-    item VARCHAR(255) NOT NULL,
-    description TEXT,
-    country VARCHAR(255),
-    city VARCHAR(255),
-    supplier VARCHAR(255),
-    quote_id VARCHAR(255),
-    currency VARCHAR(3),
-    total_cost NUMERIC(20, 2),
-    quantity INTEGER,
-    hours INTEGER,
-    unit_cost NUMERIC(20, 2),
-    unit_cost_usd NUMERIC(20, 2)
-);
-"""
-
 connection = None
-cursor = None
 try:
     connection = psycopg2.connect(
         dbname=dbname, user=user, password=password, host=host, port=port
     )
 
-    # Create a new database session and return a new instance of the connection class
-    cursor = connection.cursor()
-    # Execute the SQL command to create the table
-    cursor.execute(create_table_query)
-    # Commit the transaction
-    connection.commit()
+    # Create singtel_data on a fresh database and bring an existing one up to
+    # the latest schema (run as: python -m singtel.db.initial_db_populate)
+    applied = apply_migrations(connection)
 
-    print("Table created successfully in PostgreSQL")
+    print(f"Schema up to date in PostgreSQL ({len(applied)} migrations applied)")
 
 except (Exception, psycopg2.DatabaseError) as error:
-    print(f"Error while creating PostgreSQL table: {error}")
+    print(f"Error while migrating PostgreSQL schema: {error}")
 finally:
     # Close the database connection
     if connection is not None:
-        cursor.close()
         connection.close()
         print("PostgreSQL connection is closed")
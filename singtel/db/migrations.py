@@ -0,0 +1,132 @@
+import psycopg2
+
+from .db_connection import borrow_connection
+
+# Arbitrary key for pg_advisory_lock, so two processes never migrate at once
+MIGRATION_LOCK_KEY = 7_302_611
+
+# (version, name, SQL) in the order they are applied. Never edit a released
+# migration; append a new one.
+MIGRATIONS = [
+    (
+        1,
+        "create singtel_data",
+        """
+        CREATE TABLE IF NOT EXISTS singtel_data (
+            id SERIAL PRIMARY KEY,
+            date TIMESTAMP,
+            item VARCHAR(255) NOT NULL,
+            description TEXT,
+            country VARCHAR(255),
+            city VARCHAR(255),
+            supplier VARCHAR(255),
+            quote_id VARCHAR(255),
+            currency VARCHAR(3),
+            total_cost NUMERIC(20, 2),
+            quantity INTEGER,
+            hours INTEGER,
+            unit_cost NUMERIC(20, 2),
+            unit_cost_usd NUMERIC(20, 2)
+        );
+        """,
+    ),
+    (
+        2,
+        "search indexes",
+        """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        -- ILIKE '%term%' on item/description
+        CREATE INDEX IF NOT EXISTS singtel_data_item_trgm_idx
+            ON singtel_data USING gin (item gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS singtel_data_description_trgm_idx
+            ON singtel_data USING gin (description gin_trgm_ops);
+
+        -- Word searches over item and description, stemmed ("routers" -> "router")
+        ALTER TABLE singtel_data ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('english', coalesce(item, '') || ' ' || coalesce(description, ''))
+            ) STORED;
+        CREATE INDEX IF NOT EXISTS singtel_data_search_vector_idx
+            ON singtel_data USING gin (search_vector);
+
+        CREATE INDEX IF NOT EXISTS singtel_data_supplier_idx ON singtel_data (supplier);
+        CREATE INDEX IF NOT EXISTS singtel_data_country_idx ON singtel_data (country);
+        CREATE INDEX IF NOT EXISTS singtel_data_date_idx ON singtel_data (date);
+
+        ANALYZE singtel_data;
+        """,
+    ),
+    (
+        3,
+        "case-insensitive supplier and country indexes",
+        """
+        -- lower("supplier") = 'singtel' and lower("supplier") LIKE 'singtel%',
+        -- whatever case the question spells the name in
+        CREATE INDEX IF NOT EXISTS singtel_data_supplier_lower_idx
+            ON singtel_data (lower(supplier) text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS singtel_data_country_lower_idx
+            ON singtel_data (lower(country) text_pattern_ops);
+
+        ANALYZE singtel_data;
+        """,
+    ),
+]
+
+
+def get_applied_versions(connection):
+    """Versions recorded in schema_migrations (empty before the first run)."""
+    with borrow_connection(connection) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return set()
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+        conn.rollback()
+    return versions
+
+
+def apply_migrations(connection, migrations=MIGRATIONS):
+    """Apply pending migrations in version order and return the versions applied.
+
+    Each migration runs in its own transaction together with its
+    schema_migrations row, so a failure leaves it unapplied and is raised
+    (psycopg2.DatabaseError) without touching the ones before it.
+    """
+    applied = []
+    with borrow_connection(connection) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            try:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                    """
+                )
+                conn.commit()
+                cursor.execute("SELECT version FROM schema_migrations")
+                done = {row[0] for row in cursor.fetchall()}
+                for version, name, sql in sorted(migrations):
+                    if version in done:
+                        continue
+                    try:
+                        cursor.execute(sql)
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name),
+                        )
+                        conn.commit()
+                    except psycopg2.DatabaseError:
+                        conn.rollback()
+                        raise
+                    print(f"Applied migration {version}: {name}")
+                    applied.append(version)
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+                conn.commit()
+    return applied
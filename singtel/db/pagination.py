@@ -0,0 +1,172 @@
+import threading
+import time
+from io import StringIO
+
+import pandas as pd
+
+from .db_connection import execute_query, get_data_version, stream_query
+
+TABLE_NAME = "singtel_data"
+VIEW_COLUMNS = [
+    "id", "date", "item", "description", "country", "city", "supplier", "quote_id",
+    "currency", "total_cost", "quantity", "hours", "unit_cost", "unit_cost_usd",
+]
+SORTABLE_COLUMNS = ["id", "date", "supplier", "country", "city", "item", "total_cost",
+                    "unit_cost_usd"]
+# Below this many rows an exact count(*) is cheap; above, use the planner's estimate
+EXACT_COUNT_BELOW = 100_000
+COUNT_CACHE_TTL = 60
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_filters(search=None, country=None, supplier=None):
+    """WHERE clause (without the keyword) and parameters for the view filters."""
+    clauses, params = [], []
+    if search:
+        pattern = f"%{_escape_like(search.strip())}%"
+        clauses.append("(item ILIKE %s OR description ILIKE %s OR supplier ILIKE %s)")
+        params += [pattern] * 3
+    if country:
+        clauses.append("country = %s")
+        params.append(country)
+    if supplier:
+        clauses.append("supplier = %s")
+        params.append(supplier)
+    return " AND ".join(clauses), params
+
+
+def _to_param(value):
+    """A DataFrame cell back as a value psycopg2 can bind (NaT/NaN -> None)."""
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item") and not isinstance(value, pd.Timestamp):
+        return value.item()
+    return value
+
+
+def _keyset_clause(sort_column, descending, cursor):
+    """Rows strictly after ``cursor`` = (sort value, id) in (sort, id) order, NULLs last."""
+    value, last_id = cursor
+    op = "<" if descending else ">"
+    if sort_column == "id":
+        return f"id {op} %s", [last_id]
+    if value is None:
+        # Past the first NULL only NULLs remain, ordered by id
+        return f"({sort_column} IS NULL AND id {op} %s)", [last_id]
+    return (
+        f"({sort_column} {op} %s OR ({sort_column} = %s AND id {op} %s) "
+        f"OR {sort_column} IS NULL)",
+        [value, value, last_id],
+    )
+
+
+def _order_by(sort_column, descending):
+    """ORDER BY list of the view: the sort column with NULLs last, then id."""
+    direction = "DESC" if descending else "ASC"
+    if sort_column == "id":
+        return f"id {direction}"
+    return f"{sort_column} {direction} NULLS LAST, id {direction}"
+
+
+def fetch_page(connection, page_size=10, cursor=None, sort_column="id", descending=False,
+               search=None, country=None, supplier=None):
+    """One page of singtel_data with keyset pagination.
+
+    ``cursor`` is the (sort value, id) of the last row of the previous page, or
+    None for the first page. Sorting, filtering and the LIMIT run in
+    PostgreSQL, so a page costs the same at row 10 and at row 200,000.
+    Returns ``(df, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    if sort_column not in SORTABLE_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort_column}")
+    where, params = build_filters(search, country, supplier)
+    clauses = [where] if where else []
+    if cursor is not None:
+        keyset, keyset_params = _keyset_clause(sort_column, descending, cursor)
+        clauses.append(keyset)
+        params += keyset_params
+
+    query = f"SELECT {', '.join(VIEW_COLUMNS)} FROM {TABLE_NAME}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    # One extra row tells whether there is a next page
+    query += f" ORDER BY {_order_by(sort_column, descending)} LIMIT %s"
+    params.append(page_size + 1)
+
+    df = execute_query(connection, query, params)
+    if df is None:
+        return None, None
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (_to_param(last[sort_column]), int(last["id"]))
+    return df, next_cursor
+
+
+def export_csv(connection, sort_column="id", descending=False, search=None, country=None,
+               supplier=None):
+    """Every row matching the view filters as CSV bytes, in the view's order.
+
+    Rows are read in stream_query chunks and written out one chunk at a time,
+    so only the CSV text and a single chunk are in memory, never the whole
+    table as a DataFrame. Database errors are raised.
+    """
+    if sort_column not in SORTABLE_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort_column}")
+    where, params = build_filters(search, country, supplier)
+    query = f"SELECT {', '.join(VIEW_COLUMNS)} FROM {TABLE_NAME}"
+    if where:
+        query += f" WHERE {where}"
+    query += f" ORDER BY {_order_by(sort_column, descending)}"
+
+    buffer = StringIO()
+    for i, chunk in enumerate(stream_query(connection, query, params)):
+        chunk.to_csv(buffer, header=i == 0, index=False)
+    return buffer.getvalue().encode()
+
+
+def count_rows(connection, search=None, country=None, supplier=None):
+    """Row count for the current filters as ``(count, estimated)``, cached.
+
+    Unfiltered counts of large tables come from pg_class.reltuples (kept up
+    to date by autovacuum/ANALYZE) instead of a full count(*). Entries expire
+    after COUNT_CACHE_TTL seconds or as soon as this process writes to the table.
+    """
+    where, params = build_filters(search, country, supplier)
+    key = (where, tuple(params), get_data_version())
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < COUNT_CACHE_TTL:
+        return cached[1]
+
+    result = None
+    if not where:
+        estimate = execute_query(
+            connection,
+            "SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = to_regclass(%s)",
+            [TABLE_NAME],
+        )
+        if estimate is not None and not estimate.empty:
+            rows = int(estimate.iloc[0]["estimate"])
+            # reltuples is -1 (or 0) before the first ANALYZE
+            if rows >= EXACT_COUNT_BELOW:
+                result = (rows, True)
+    if result is None:
+        query = f"SELECT count(*) AS total FROM {TABLE_NAME}"
+        if where:
+            query += f" WHERE {where}"
+        total = execute_query(connection, query, params)
+        result = (int(total.iloc[0]["total"]) if total is not None else 0, False)
+
+    with _count_lock:
+        if len(_count_cache) > 256:
+            _count_cache.clear()
+        _count_cache[key] = (time.monotonic(), result)
+    return result
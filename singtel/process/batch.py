@@ -0,0 +1,214 @@
+"""Headless batch ingestion of quote workbooks into singtel_data.
+
+Usage:
+    python -m singtel.process.batch PATH [PATH ...] [--template auto|A|B|C]
+        [--workers N] [--manifest FILE] [--dsn DSN] [--dry-run]
+
+PATH is a directory (searched recursively for .xls/.xlsx) or a glob. Files are
+processed in a process pool; the parent writes each file's rows to
+singtel_data in one COPY transaction and appends a line to the JSONL manifest.
+Rerunning with the same manifest skips files already ingested (matched by
+content hash), so an interrupted backfill resumes where it stopped.
+
+The database comes from --dsn, DATABASE_URL or the Streamlit secrets. The LLM
+endpoint follows OPENAI_BASE_URL, so a stub server can stand in for it.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .llm_executor import LLM_REQUESTS_PER_MINUTE
+from .main import NON_DATA_SHEET_PATTERN, PROCESSORS
+from .workbook import load_uploaded_workbook
+
+WORKBOOK_EXTENSIONS = (".xls", ".xlsx")
+DEFAULT_MANIFEST = "ingest_manifest.jsonl"
+
+
+def find_workbooks(paths):
+    """Workbook files under the given directories or globs, sorted and unique."""
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = glob.glob(os.path.join(path, "**", "*"), recursive=True)
+        else:
+            candidates = glob.glob(path, recursive=True)
+        for candidate in candidates:
+            name = os.path.basename(candidate)
+            # "~$..." files are Excel lock files, not workbooks
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$"):
+                found.add(os.path.abspath(candidate))
+    return sorted(found)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_template(workbook):
+    """Guess the upload template from the sheet layout.
+
+    A quotation sheet next to line-item sheets is Template C, several priced
+    sheets is Template B, a single priced sheet is Template A.
+    """
+    names = workbook.sheet_names
+    if len(names) > 1 and any("quotation" in name.lower() for name in names):
+        return "Template C"
+    data_sheets = [n for n in names if not re.search(NON_DATA_SHEET_PATTERN, n, re.IGNORECASE)]
+    return "Template B" if len(data_sheets) > 1 else "Template A"
+
+
+def load_manifest(path):
+    """Content hashes of files the manifest records as ingested."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interruption
+            if entry.get("status") == "done":
+                done.add(entry["sha256"])
+    return done
+
+
+def append_manifest(path, entry):
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def process_file(path, template):
+    """Worker: run one workbook through its processor, never raises."""
+    start = time.perf_counter()
+    result = {"file": path, "template": template, "df": None, "error": ""}
+    try:
+        workbook = load_uploaded_workbook(path)
+        if template == "auto":
+            template = result["template"] = detect_template(workbook)
+        result["df"] = PROCESSORS[template](workbook)
+    except Exception as e:
+        result["error"] = f"Error: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _write_rows(connection, df):
+    from singtel.db.db_connection import copy_data
+
+    # One transaction per file, so the manifest never records a partial load
+    response = copy_data(connection, df, batch_size=None)
+    if response.startswith("Error"):
+        raise RuntimeError(response)
+    return len(df)
+
+
+def run_batch(paths, template="auto", workers=None, manifest=DEFAULT_MANIFEST,
+              dsn=None, dry_run=False):
+    """Ingest every workbook under ``paths``; returns the run summary."""
+    files = find_workbooks(paths)
+    done = load_manifest(manifest)
+    hashes = {path: file_sha256(path) for path in files}
+    pending = [path for path in files if hashes[path] not in done]
+    print(f"{len(files)} workbooks found, {len(files) - len(pending)} already ingested, "
+          f"{len(pending)} to process")
+
+    connection = None
+    if pending and not dry_run:
+        from singtel.db.db_connection import connect_to_db
+
+        connection = connect_to_db(dsn or os.environ.get("DATABASE_URL"))
+        if connection is None:
+            raise SystemExit("Could not connect to the database")
+
+    workers = workers or os.cpu_count() or 1
+    # Every worker has its own rate limiter, split the budget between them.
+    # Spawned workers read it from the environment when they import the package.
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(LLM_REQUESTS_PER_MINUTE / workers)
+
+    summary = {"files": len(pending), "done": 0, "failed": 0, "rows": 0}
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        futures = [executor.submit(process_file, path, template) for path in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            entry = {
+                "file": result["file"],
+                "sha256": hashes[result["file"]],
+                "template": result["template"],
+                "seconds": round(result["seconds"], 2),
+            }
+            try:
+                if result["error"]:
+                    raise RuntimeError(result["error"])
+                df = result["df"]
+                entry["rows"] = len(df) if dry_run else _write_rows(connection, df)
+                entry["status"] = "checked" if dry_run else "done"
+            except Exception as e:
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+            append_manifest(manifest, entry)
+
+            if entry["status"] == "failed":
+                summary["failed"] += 1
+                print(f"FAILED {entry['file']}: {entry['error']}")
+            else:
+                summary["done"] += 1
+                summary["rows"] += entry["rows"]
+                print(f"ok     {entry['file']} ({entry['template']}, {entry['rows']} rows, "
+                      f"{entry['seconds']}s)")
+    except KeyboardInterrupt:
+        print("Interrupted, rerun with the same manifest to resume")
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if connection is not None:
+            connection.close()
+
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = elapsed
+    summary["files_per_minute"] = summary["files"] / elapsed * 60 if elapsed else 0.0
+    print(f"{summary['done']} ingested, {summary['failed']} failed, {summary['rows']} rows "
+          f"in {elapsed:.1f}s ({summary['files_per_minute']:.1f} files/min)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("paths", nargs="+", help="directories or globs of workbooks")
+    parser.add_argument("--template", default="auto", choices=["auto", "A", "B", "C"])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--dsn", default=None,
+                        help="PostgreSQL DSN (default: DATABASE_URL or Streamlit secrets)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="process and report without writing to the database")
+    args = parser.parse_args()
+
+    template = "auto" if args.template == "auto" else f"Template {args.template}"
+    summary = run_batch(args.paths, template, args.workers, args.manifest, args.dsn,
+                        args.dry_run)
+    raise SystemExit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
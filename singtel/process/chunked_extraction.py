@@ -0,0 +1,148 @@
+import logging
+import os
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+from .llm_executor import run_concurrently
+
+logger = logging.getLogger(__name__)
+
+LLM_CHUNK_TOKEN_BUDGET = int(os.environ.get("LLM_CHUNK_TOKEN_BUDGET", "6000"))
+LLM_CHUNK_MAX_ATTEMPTS = int(os.environ.get("LLM_CHUNK_MAX_ATTEMPTS", "3"))
+CHARS_PER_TOKEN = 4
+
+# ``sheet`` is the sheet's position (None for a single whole-workbook chunk);
+# ``repeated_header`` is the sheet's first line when this chunk repeats it.
+Chunk = namedtuple("Chunk", ["sheet", "repeated_header", "text"])
+
+
+def estimate_tokens(text):
+    # Rough but stable: ~4 characters per token for English/tabular text.
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def clean_sheet_text(df_str):
+    df_str = re.sub("\n", "\n\n", df_str)
+    df_str = re.sub(r"\n[\s]+\n", "", df_str)
+    return df_str
+
+
+def split_into_chunks(sheet_texts, token_budget=LLM_CHUNK_TOKEN_BUDGET):
+    """Split the per-sheet table text into prompt-sized Chunks.
+
+    If the whole workbook fits the budget the result is a single chunk
+    identical to the old concatenated ``df_str``. Otherwise each sheet is cut
+    into row blocks under the budget; every block after the first repeats the
+    sheet's first row so the LLM still sees the header.
+    """
+    whole = clean_sheet_text("".join(sheet_texts))
+    if estimate_tokens(whole) <= token_budget:
+        return [Chunk(None, None, whole)] if whole.strip() else []
+
+    chunks = []
+    for sheet, sheet_text in enumerate(sheet_texts):
+        lines = sheet_text.split("\n")
+        if not lines or not sheet_text.strip():
+            continue
+        header_line = lines[0]
+        repeated_header = None
+        block = [header_line]
+        block_tokens = estimate_tokens(header_line)
+        for line in lines[1:]:
+            line_tokens = estimate_tokens(line)
+            if len(block) > 1 and block_tokens + line_tokens > token_budget:
+                chunks.append(Chunk(sheet, repeated_header, clean_sheet_text("\n".join(block))))
+                repeated_header = header_line
+                block = [header_line]
+                block_tokens = estimate_tokens(header_line)
+            block.append(line)
+            block_tokens += line_tokens
+        chunks.append(Chunk(sheet, repeated_header, clean_sheet_text("\n".join(block))))
+    return chunks
+
+
+def _normalize_value(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return re.sub(r"[^0-9a-z]", "", str(value).lower())
+
+
+def _from_line(frame, line):
+    """Boolean Series, True for rows whose non-blank values all occur in ``line``."""
+    line = _normalize_value(line)
+    matches = []
+    for row in frame.itertuples(index=False):
+        values = [_normalize_value(value) for value in row if not pd.isna(value)]
+        values = [value for value in values if value]
+        matches.append(bool(values) and all(value in line for value in values))
+    return pd.Series(matches, index=frame.index, dtype=bool)
+
+
+def merge_chunk_frames(chunks, frames):
+    """Concatenate per-chunk results, dropping rows read twice from a repeated header.
+
+    Only a row of a continuation chunk that comes from the sheet's repeated
+    first line, and that an earlier chunk of the same sheet already returned,
+    is dropped. Identical line items, within a sheet or across sheets, are kept.
+    """
+    kept = []
+    seen = {}
+    for chunk, frame in zip(chunks, frames):
+        if frame is None:
+            continue
+        rows = list(frame.astype(str).itertuples(index=False, name=None))
+        earlier = seen.setdefault(chunk.sheet, set())
+        if chunk.repeated_header is not None and earlier:
+            repeated = _from_line(frame, chunk.repeated_header).to_numpy()
+            drop = [from_header and row in earlier for from_header, row in zip(repeated, rows)]
+            if any(drop):
+                frame = frame[[not dropped for dropped in drop]]
+        earlier.update(rows)
+        kept.append(frame)
+    return pd.concat(kept, ignore_index=True)
+
+
+def extract_chunks(chunks, desired_columns, extract, max_attempts=LLM_CHUNK_MAX_ATTEMPTS):
+    """Run ``extract(chunk.text, desired_columns)`` over all Chunks concurrently.
+
+    ``extract`` returns a DataFrame, or an error string when the CSV reply
+    could not be parsed. Only the failed chunks are retried. Chunks that still
+    fail are logged and left out; if every chunk fails a ValueError is raised.
+    Results are merged with merge_chunk_frames.
+    """
+    results = [None] * len(chunks)
+    errors = {}
+    remaining = list(range(len(chunks)))
+    for attempt in range(1, max_attempts + 1):
+        if not remaining:
+            break
+        outcomes = run_concurrently(
+            [lambda i=i: extract(chunks[i].text, desired_columns) for i in remaining],
+            return_exceptions=True,
+        )
+        failed = []
+        for index, outcome in zip(remaining, outcomes):
+            if isinstance(outcome, pd.DataFrame):
+                results[index] = outcome
+            else:
+                errors[index] = outcome
+                failed.append(index)
+        if failed:
+            logger.warning(
+                f"{len(failed)} of {len(chunks)} chunks failed on attempt {attempt}"
+            )
+        remaining = failed
+
+    for index in remaining:
+        logger.error(f"Chunk {index} could not be extracted: {errors[index]}")
+
+    frames = [result for result in results if result is not None]
+    if not frames:
+        raise ValueError(
+            f"Could not extract any rows: {errors[remaining[0]] if remaining else 'no data'}"
+        )
+    if len(frames) == 1:
+        return frames[0]
+    return merge_chunk_frames(chunks, results)
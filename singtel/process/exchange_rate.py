@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import requests
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "USD"
+FRANKFURTER_URL = "https://api.frankfurter.app"
+REQUEST_TIMEOUT = float(os.environ.get("EXCHANGE_RATE_TIMEOUT", "10"))
+CACHE_TTL_SECONDS = float(os.environ.get("EXCHANGE_RATE_TTL", "3600"))
+RATES_CACHE_FILE = "exchange_rates.json"
+
+
+class RateProviderError(Exception):
+    """The provider could not be reached or returned an unusable answer."""
+
+
+class FrankfurterProvider:
+    """Rates from frankfurter.app, all requested currencies in one request."""
+
+    def __init__(self, base_url=FRANKFURTER_URL, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def get_rates(self, currencies, on_date=None):
+        """Return {currency: units of USD per one unit of currency}."""
+        endpoint = on_date.isoformat() if on_date else "latest"
+        params = {"from": BASE_CURRENCY, "to": ",".join(sorted(currencies))}
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout
+            )
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RateProviderError(f"Error fetching exchange rates: {e}") from e
+
+        if "error" in data or "rates" not in data:
+            # Frankfurter rejects the whole request if one symbol is unknown, so
+            # fall back to asking for the currencies one by one.
+            if len(currencies) > 1:
+                rates = {}
+                for currency in currencies:
+                    rates.update(self.get_rates([currency], on_date))
+                return rates
+            logger.warning(f"Error fetching exchange rate: {data.get('message', data)}")
+            return {}
+
+        # The response is USD -> currency, we store currency -> USD.
+        return {
+            currency: 1 / rate for currency, rate in data["rates"].items() if rate
+        }
+
+
+class FileRatesProvider:
+    """Rates from a local JSON file, for air-gapped runs and tests.
+
+    The file maps ISO 4217 codes to the USD value of one unit, e.g.
+    ``{"EUR": 1.08, "SGD": 0.74}``, or holds one such mapping per ISO date under
+    a ``"dates"`` key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path) as f:
+            self.data = json.load(f)
+
+    def get_rates(self, currencies, on_date=None):
+        rates = self.data
+        if "dates" in self.data:
+            dated = self.data["dates"]
+            if on_date is not None and on_date.isoformat() in dated:
+                rates = dated[on_date.isoformat()]
+            elif dated:
+                rates = dated[max(dated)]
+            else:
+                rates = {}
+        return {c: float(rates[c]) for c in currencies if c in rates}
+
+
+_cache = {}  # (currency, iso date) -> (rate, fetched_at)
+_cache_lock = threading.Lock()
+_provider = None
+
+
+def get_rate_provider():
+    global _provider
+    if _provider is None:
+        rates_file = os.environ.get("EXCHANGE_RATES_FILE")
+        _provider = FileRatesProvider(rates_file) if rates_file else FrankfurterProvider()
+    return _provider
+
+
+def set_rate_provider(provider):
+    """Swap the rate source (e.g. a FileRatesProvider in tests) and drop cached rates."""
+    global _provider
+    _provider = provider
+    clear_rate_cache()
+
+
+def clear_rate_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def normalize_currency(currency):
+    if currency is None or (not isinstance(currency, str) and pd.isna(currency)):
+        return ""
+    return str(currency).strip().upper()
+
+
+def _load_last_known_rates():
+    try:
+        with open(get_cache_path(RATES_CACHE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_last_known_rates(rates):
+    if not rates:
+        return
+    known = _load_last_known_rates()
+    known.update(rates)
+    try:
+        with open(get_cache_path(RATES_CACHE_FILE), "w") as f:
+            json.dump(known, f)
+    except OSError as e:
+        logger.warning(f"Could not persist exchange rates: {e}")
+
+
+def get_rates(currencies, on_date=None):
+    """Return {currency: USD per unit} for every currency, with one provider call.
+
+    Rates are cached per (currency, date) for ``CACHE_TTL_SECONDS``. A currency
+    the provider answered for but does not know maps to ``None``. If the
+    provider is unreachable the last rate we ever saw is used, and currencies
+    with no rate at all are left out of the result.
+    """
+    key_date = (on_date or date.today()).isoformat()
+    wanted = {normalize_currency(c) for c in currencies} - {"", BASE_CURRENCY}
+    rates = {BASE_CURRENCY: 1.0}
+    now = time.time()
+
+    with _cache_lock:
+        for currency in wanted:
+            cached = _cache.get((currency, key_date))
+            if cached and now - cached[1] < CACHE_TTL_SECONDS:
+                rates[currency] = cached[0]
+    missing = wanted - rates.keys()
+    if not missing:
+        return rates
+
+    try:
+        fetched = get_rate_provider().get_rates(missing, on_date)
+    except RateProviderError as e:
+        logger.warning(f"{e}; using last known rates")
+        last_known = _load_last_known_rates()
+        rates.update({c: last_known[c] for c in missing if c in last_known})
+        return rates
+
+    fetched = {c: fetched.get(c) for c in missing}
+    with _cache_lock:
+        for currency, rate in fetched.items():
+            _cache[(currency, key_date)] = (rate, now)
+    _save_last_known_rates({c: r for c, r in fetched.items() if r is not None})
+    rates.update(fetched)
+    return rates
+
+
+def convert_column_to_usd(amounts, currencies, on_date=None):
+    """Vectorized USD conversion of a whole amount column.
+
+    ``currencies`` is a Series aligned with ``amounts`` or a single code. Blank
+    currencies and currencies the provider does not know keep the amount
+    unchanged, as get_exchange_rate always did; currencies whose rate could not
+    be fetched at all become NaN.
+    """
+    amounts = pd.to_numeric(amounts, errors="coerce").astype("float64")
+    if not isinstance(currencies, pd.Series):
+        currencies = pd.Series(currencies, index=amounts.index)
+    codes = currencies.map(normalize_currency)
+
+    unique_codes = codes.unique().tolist()
+    rates = get_rates(unique_codes, on_date)
+    lookup = {}
+    for code in unique_codes:
+        if code == "" or (code in rates and rates[code] is None):
+            lookup[code] = 1.0
+        else:
+            lookup[code] = rates.get(code, np.nan)
+    return (amounts * codes.map(lookup).astype("float64")).round(2)
+
+
+def get_exchange_rate(from_currency, to_currency="USD"):
+    if not from_currency:
+        return 1
+    rates = get_rates([from_currency, to_currency])
+    from_rate = rates.get(normalize_currency(from_currency))
+    to_rate = rates.get(normalize_currency(to_currency))
+    if not from_rate or not to_rate:
+        return 1
+    return from_rate / to_rate
+
+
+def convert_to_usd(amount, from_currency):
+    return convert_column_to_usd(pd.Series([amount]), from_currency).iloc[0]
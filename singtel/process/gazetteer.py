@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+WORLD_CITIES_CSV = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../files/worldcities.csv")
+)
+ARTIFACT_VERSION = 1
+
+
+class Gazetteer:
+    """In-memory city/country index compiled from worldcities.csv.
+
+    All lookups are plain dict/set probes.
+    """
+
+    def __init__(self, city_to_country, iso2_to_country, countries):
+        self.city_to_country = city_to_country
+        self.city_set = frozenset(city_to_country)
+        self.iso2_to_country = iso2_to_country
+        # Keep the CSV order, ``country_list`` consumers iterate it.
+        self.countries = countries
+        self.country_set = frozenset(countries)
+
+    def country_for_city(self, city):
+        return self.city_to_country.get(city)
+
+    def country_for_iso2(self, iso2):
+        return self.iso2_to_country.get(iso2)
+
+    def is_country(self, name):
+        return name in self.country_set
+
+    def is_city(self, name):
+        return name in self.city_set
+
+
+def compile_gazetteer(csv_path=WORLD_CITIES_CSV):
+    """Parse the CSV once, with the same aggregation the old helpers used."""
+    city_country_df = pd.read_csv(csv_path)
+    aggregated = city_country_df.groupby("city_ascii").first().reset_index()
+    city_to_country = aggregated.set_index("city_ascii")["country"].to_dict()
+    iso2_to_country = (
+        aggregated[["iso2", "country"]]
+        .drop_duplicates()
+        .set_index("iso2")["country"]
+        .to_dict()
+    )
+    countries = aggregated["country"].unique().tolist()
+    return Gazetteer(city_to_country, iso2_to_country, countries)
+
+
+def _artifact_path(csv_path):
+    stat = os.stat(csv_path)
+    fingerprint = hashlib.sha1(
+        f"{ARTIFACT_VERSION}:{os.path.abspath(csv_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    ).hexdigest()[:16]
+    return get_cache_path(f"gazetteer-{fingerprint}.pickle")
+
+
+def build_artifact(csv_path=WORLD_CITIES_CSV):
+    """Compile the CSV and write the on-disk artifact, returning the index."""
+    gazetteer = compile_gazetteer(csv_path)
+    path = _artifact_path(csv_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(
+            (gazetteer.city_to_country, gazetteer.iso2_to_country, gazetteer.countries),
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp_path, path)
+    return gazetteer
+
+
+def load_gazetteer(csv_path=WORLD_CITIES_CSV):
+    """Load the compiled artifact, compiling it first if the CSV changed."""
+    start = time.perf_counter()
+    path = _artifact_path(csv_path)
+    try:
+        with open(path, "rb") as f:
+            gazetteer = Gazetteer(*pickle.load(f))
+        source = "artifact"
+    except (OSError, pickle.UnpicklingError, EOFError, TypeError):
+        gazetteer = build_artifact(csv_path)
+        source = "csv"
+    logger.info(
+        f"Gazetteer loaded from {source} in {time.perf_counter() - start:.3f}s"
+    )
+    return gazetteer
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide gazetteer, loaded on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = load_gazetteer()
+    return _gazetteer
+
+
+LOCATION_COLUMNS = ("Country", "City")
+CELL_SPLIT_PATTERN = r"\s*[,.;]\s*"
+
+
+def resolve_city_country(df, gazetteer=None):
+    """Fill City/Country for every row from the first place name found in it.
+
+    Cells of the non-location columns are scanned left to right, each cell
+    split on ``,.;``, and the first part that is a known city (or, failing
+    that, a known country) wins. Rows without a match are left untouched.
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    positions = [
+        pos for pos, col in enumerate(df.columns) if col not in LOCATION_COLUMNS
+    ]
+    if df.empty or not positions:
+        return df
+
+    # One long frame of (row position, column position, cell part), in scan order.
+    tokens = []
+    for col_pos in positions:
+        cells = df.iloc[:, col_pos].reset_index(drop=True)
+        cells = cells[cells.notna()]
+        if cells.empty:
+            continue
+        parts = cells.astype(str).str.strip().str.split(CELL_SPLIT_PATTERN, regex=True)
+        parts = parts.explode().str.strip()
+        tokens.append(pd.DataFrame({"row": parts.index, "col": col_pos, "part": parts.values}))
+    if not tokens:
+        return df
+    tokens = pd.concat(tokens, ignore_index=True)
+
+    city_country = tokens["part"].map(gazetteer.city_to_country)
+    is_city = tokens["part"].isin(gazetteer.city_set)
+    is_country = tokens["part"].isin(gazetteer.country_set)
+    tokens["country"] = city_country.where(is_city, tokens["part"])
+    tokens["city"] = tokens["part"].where(is_city, None)
+
+    # ``tokens`` is already ordered by column then part within each row, so a
+    # stable sort on row keeps the first hit per row.
+    matches = tokens[is_city | is_country].sort_values("row", kind="stable")
+    matches = matches.drop_duplicates("row", keep="first")
+    if matches.empty:
+        return df
+
+    df = df.copy()
+    for col in LOCATION_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+        df[col] = df[col].astype(object)
+    rows = matches["row"].to_numpy()
+    df.iloc[rows, df.columns.get_loc("Country")] = matches["country"].to_numpy()
+    df.iloc[rows, df.columns.get_loc("City")] = matches["city"].to_numpy()
+    return df
@@ -0,0 +1,270 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+# Mappings scoring below this go to the LLM; set above 1 to always use the LLM.
+HEADER_MAPPER_THRESHOLD = float(os.environ.get("HEADER_MAPPER_THRESHOLD", "0.85"))
+# Headers scoring below this against every column are unrelated and ignored.
+UNRELATED_BELOW = 0.5
+# Two columns this close for the same header are a coin toss, not a mapping.
+MIN_MARGIN = 0.05
+LEARNED_MAPPINGS_FILE = "header_mappings.json"
+# A learned target counts once this many accepted uploads agree on it...
+LEARNED_MIN_COUNT = int(os.environ.get("HEADER_MAPPER_LEARNED_MIN_COUNT", "3"))
+# ...and they are at least this share of everything learned for the header.
+LEARNED_MIN_SHARE = 0.75
+# Learned targets rank with noise-stripped synonym matches, below exact ones. A
+# learned "ignore" ranks lower still: every header an upload left unmapped is one.
+LEARNED_SCORE = 0.95
+LEARNED_IGNORE_SCORE = 0.9
+
+# Header spellings seen in supplier quotes, per desired column.
+SYNONYMS = {
+    "Date": ["date", "quote date", "quotation date", "issue date"],
+    "Item": [
+        "item", "items", "item name", "product", "product name", "service",
+        "services", "material", "equipment", "hardware", "model",
+    ],
+    "Description": [
+        "description", "desc", "item description", "product description",
+        "service description", "particulars", "details", "specification",
+    ],
+    "Country": ["country", "site country"],
+    "City": ["city", "site city", "location"],
+    "Supplier": ["supplier", "vendor", "supplier name", "vendor name"],
+    "Quote #": [
+        "quote no", "quote number", "quotation no", "quotation number",
+        "quote id", "quote ref", "quote reference",
+    ],
+    "Currency": ["currency", "ccy", "curr", "currency code"],
+    "Total Cost": [
+        "total cost", "total price", "total", "amount", "total amount",
+        "extended price", "ext price", "line total", "net price", "total charges",
+    ],
+    "QTY": ["qty", "quantity", "units", "no of units", "qty units"],
+    "Hours": ["hours", "hrs", "man hours", "effort hours", "no of hours"],
+    "Unit Cost": [
+        "unit cost", "unit price", "price per unit", "unit rate", "rate",
+        "price", "cost per unit", "list price",
+    ],
+    "Unit Cost (USD)": ["unit cost usd"],
+}
+
+# Headers that look like a column but must stay unmapped (row numbers, ids, notes).
+IGNORED_HEADERS = [
+    "s n", "sn", "s no", "sl no", "no", "line", "line no", "item no",
+    "item number", "part no", "part number", "sku", "remarks", "notes", "comments",
+]
+
+# Every mapping needs one column of each group to be usable.
+REQUIRED_COLUMN_GROUPS = [("Item", "Description"), ("Total Cost", "Unit Cost")]
+
+# Currency codes and unit suffixes, "Total Price (SGD)" reads as "total price".
+NOISE_TOKENS = {
+    "usd", "sgd", "eur", "gbp", "inr", "hkd", "aud", "jpy", "cny", "myr",
+    "pcs", "ea", "in", "of", "the",
+}
+
+_IGNORE = ""
+_stats_lock = threading.Lock()
+_stats = {"resolved_locally": 0, "escalated": 0, "llm_seconds": 0.0}
+_learned_lock = threading.Lock()
+_learned = None
+
+
+def normalize_header(value):
+    text = str(value).lower().replace("#", " no ")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def _strip_noise(normalized):
+    tokens = [t for t in normalized.split() if t not in NOISE_TOKENS]
+    return " ".join(tokens) if tokens else normalized
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(header, synonym):
+    """Score in [0, 1] of a normalized header against a normalized synonym.
+
+    1.0 for an exact match, 0.95 once currency/unit noise is dropped, otherwise
+    the better of token Jaccard and character-trigram Dice, scaled to 0.9 so a
+    fuzzy match never outranks an exact one.
+    """
+    if header == synonym:
+        return 1.0
+    header, synonym = _strip_noise(header), _strip_noise(synonym)
+    if header == synonym:
+        return 0.95
+    header_tokens, synonym_tokens = set(header.split()), set(synonym.split())
+    jaccard = len(header_tokens & synonym_tokens) / len(header_tokens | synonym_tokens)
+    header_grams, synonym_grams = _trigrams(header), _trigrams(synonym)
+    dice = 2 * len(header_grams & synonym_grams) / (len(header_grams) + len(synonym_grams))
+    return 0.9 * max(jaccard, dice)
+
+
+def _load_learned():
+    global _learned
+    if _learned is None:
+        try:
+            with open(get_cache_path(LEARNED_MAPPINGS_FILE)) as f:
+                _learned = json.load(f)
+        except (OSError, ValueError):
+            _learned = {}
+    return _learned
+
+
+def _learned_target(normalized, desired_columns):
+    """The column accepted uploads agree on for a header, or None if they don't yet."""
+    with _learned_lock:
+        counts = dict(_load_learned().get(normalized, {}))
+    counts = {k: v for k, v in counts.items() if k == _IGNORE or k in desired_columns}
+    if not counts:
+        return None
+    target = max(counts, key=counts.get)
+    agreeing = counts[target]
+    if agreeing < LEARNED_MIN_COUNT or agreeing < LEARNED_MIN_SHARE * sum(counts.values()):
+        return None
+    return target
+
+
+def remember_header_mappings(mappings):
+    """Learn from accepted uploads: ``mappings`` is a list of (header, mapped_dict)."""
+    with _learned_lock:
+        learned = _load_learned()
+        for header, mapped_dict in mappings:
+            targets = {str(v): k for k, v in mapped_dict.items() if v != ""}
+            for value in header:
+                normalized = normalize_header(value)
+                if not normalized:
+                    continue
+                target = targets.get(str(value), _IGNORE)
+                counts = learned.setdefault(normalized, {})
+                counts[target] = counts.get(target, 0) + 1
+        try:
+            with open(get_cache_path(LEARNED_MAPPINGS_FILE), "w") as f:
+                json.dump(learned, f)
+        except OSError as e:
+            logger.warning(f"Could not persist learned header mappings: {e}")
+
+
+def _score_header(value, desired_columns):
+    """Ranked (score, column) candidates for one header; column "" means ignore."""
+    normalized = normalize_header(value)
+    if not normalized:
+        return [(1.0, _IGNORE)]
+    learned = _learned_target(normalized, desired_columns)
+    candidates = []
+    for column in desired_columns:
+        spellings = [normalize_header(column)] + SYNONYMS.get(column, [])
+        score = max(similarity(normalized, s) for s in spellings)
+        if column == learned:
+            score = max(score, LEARNED_SCORE)
+        candidates.append((score, column))
+    score = max(similarity(normalized, s) for s in IGNORED_HEADERS)
+    if learned == _IGNORE:
+        score = max(score, LEARNED_IGNORE_SCORE)
+    candidates.append((score, _IGNORE))
+    return sorted(candidates, key=lambda c: c[0], reverse=True)
+
+
+def map_headers(header, desired_columns):
+    """Map header cells onto the desired columns without the LLM.
+
+    Returns ``(mapped_dict, confidence)`` where ``mapped_dict`` has the shape the
+    LLM produces (every desired column, "" when unmapped) and ``confidence`` is
+    the weakest decision taken: the lowest accepted score, the score of a header
+    that could not be placed, or 0 when a required column is missing.
+    """
+    mapped = {column: "" for column in desired_columns}
+    scores = {}
+    confidence = 1.0
+    for value in header:
+        ranked = _score_header(value, desired_columns)
+        best_score, best_column = ranked[0]
+        if best_score < UNRELATED_BELOW:
+            continue
+        if best_score < HEADER_MAPPER_THRESHOLD:
+            confidence = min(confidence, best_score)
+            continue
+        if len(ranked) > 1 and best_score - ranked[1][0] < MIN_MARGIN:
+            confidence = min(confidence, best_score - ranked[1][0])
+            continue
+        if best_column == _IGNORE:
+            continue
+        if best_column in scores:
+            # Two confident headers for one column ("Total", "Total Price"):
+            # only as sure as the gap between them
+            confidence = min(confidence, abs(scores[best_column] - best_score))
+            if best_score <= scores[best_column]:
+                continue
+        mapped[best_column] = value
+        scores[best_column] = best_score
+        confidence = min(confidence, best_score)
+
+    for group in REQUIRED_COLUMN_GROUPS:
+        present = [column for column in group if column in desired_columns]
+        if present and not any(mapped[column] != "" for column in present):
+            confidence = 0.0
+    return mapped, confidence
+
+
+def _plain_value(value):
+    """A header cell as a str, int or finite float, which JSON and literal_eval agree on."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    return str(value)
+
+
+def resolve_header_mapping(header, desired_columns, llm_mapping):
+    """Mapping string from the local mapper, or from ``llm_mapping()`` when unsure."""
+    mapped, confidence = map_headers(header, desired_columns)
+    if confidence >= HEADER_MAPPER_THRESHOLD:
+        with _stats_lock:
+            _stats["resolved_locally"] += 1
+        logger.info(f"Header mapping resolved locally (confidence {confidence:.2f})")
+        # Parsed back with ast.literal_eval like the LLM's reply, so plain literals only
+        return json.dumps({column: _plain_value(value) for column, value in mapped.items()})
+
+    start = time.perf_counter()
+    response = llm_mapping()
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        _stats["escalated"] += 1
+        _stats["llm_seconds"] += elapsed
+    logger.info(
+        f"Header mapping escalated to the LLM (confidence {confidence:.2f}, {elapsed:.2f}s)"
+    )
+    return response
+
+
+def get_header_mapping_stats():
+    """Counts of local vs LLM header mappings since the process started."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["resolved_locally"] + stats["escalated"]
+    stats["local_fraction"] = stats["resolved_locally"] / total if total else 0.0
+    return stats
+
+
+def log_header_mapping_stats():
+    stats = get_header_mapping_stats()
+    logger.info(
+        f"Header mappings: {stats['resolved_locally']} local, {stats['escalated']} LLM "
+        f"({stats['local_fraction']:.0%} resolved locally, {stats['llm_seconds']:.1f}s in the LLM)"
+    )
@@ -0,0 +1,226 @@
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from io import BytesIO
+
+from .main import PROCESSORS
+from .storage import CACHE_DIR, get_cache_path
+
+logger = logging.getLogger(__name__)
+
+# Processing is dominated by LLM round trips, so threads are enough and share
+# the OCR reader, LLM client and rate limiter loaded in this process.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOBS_DB_FILE = "jobs.sqlite3"
+# Jobs (and their stored results) not updated for this long are deleted, reviewed or not
+JOB_RETENTION_DAYS = float(os.environ.get("JOB_RETENTION_DAYS", "7"))
+# Seconds between those clean-ups while the process runs
+JOB_CLEANUP_INTERVAL = 3600
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_executor = None
+_executor_lock = threading.Lock()
+_db_lock = threading.Lock()
+_cleaned_at = 0.0
+
+
+def _connect():
+    connection = sqlite3.connect(get_cache_path(JOBS_DB_FILE), timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL DEFAULT '',
+            content_key TEXT NOT NULL,
+            template TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL DEFAULT '',
+            progress REAL NOT NULL DEFAULT 0,
+            error TEXT NOT NULL DEFAULT '',
+            rows INTEGER,
+            reviewed INTEGER NOT NULL DEFAULT 0,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        )
+        """
+    )
+    # Job databases created before jobs had an owner
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    if "owner" not in columns:
+        connection.execute("ALTER TABLE jobs ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        connection.commit()
+    return connection
+
+
+def _update_job(job_id, **fields):
+    fields["updated"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _db_lock, closing(_connect()) as connection, connection:
+        connection.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id]
+        )
+
+
+def _result_path(job_id):
+    return get_cache_path(f"job_{job_id}.pkl")
+
+
+def _remove_result(job_id):
+    try:
+        os.remove(_result_path(job_id))
+    except OSError:
+        pass
+
+
+def _expire_jobs():
+    """Delete jobs older than JOB_RETENTION_DAYS and any stored result that old.
+
+    Results of jobs nobody came back to review (their session is gone) would
+    otherwise stay in the cache directory for good.
+    """
+    global _cleaned_at
+    now = time.time()
+    if now - _cleaned_at < JOB_CLEANUP_INTERVAL:
+        return
+    _cleaned_at = now
+    cutoff = now - JOB_RETENTION_DAYS * 86400
+    with _db_lock, closing(_connect()) as connection, connection:
+        expired = connection.execute(
+            "DELETE FROM jobs WHERE updated < ? AND status NOT IN (?, ?)",
+            (cutoff, *ACTIVE_STATUSES),
+        ).rowcount
+    # By file age too, which also catches results whose job row is already gone
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_DIR, "job_*.pkl")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    if expired or removed:
+        logger.info(f"Expired {expired} jobs and {removed} stored results")
+
+
+def get_job_executor():
+    """Worker pool shared by every session of this process.
+
+    Jobs left queued or running by a previous process are marked failed on
+    first use, they cannot resume without their worker, and expired jobs are
+    cleaned up.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                with _db_lock, closing(_connect()) as connection, connection:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, error = ?, updated = ? "
+                        "WHERE status IN (?, ?)",
+                        (FAILED, "Interrupted by a restart, please upload again",
+                         time.time(), *ACTIVE_STATUSES),
+                    )
+                _expire_jobs()
+                _executor = ThreadPoolExecutor(
+                    max_workers=JOB_WORKERS, thread_name_prefix="upload-job"
+                )
+    return _executor
+
+
+def _run_job(job_id, content, file_name, template):
+    _update_job(job_id, status=RUNNING, stage="Starting", progress=0.0)
+
+    def progress(stage, fraction):
+        _update_job(job_id, stage=stage, progress=fraction)
+
+    uploaded_file = BytesIO(content)
+    uploaded_file.name = file_name
+    start = time.perf_counter()
+    try:
+        result = PROCESSORS[template](uploaded_file, progress=progress)
+        with open(_result_path(job_id), "wb") as f:
+            pickle.dump(result, f)
+    except Exception as e:
+        logger.exception(f"Job {job_id} ({file_name}) failed")
+        _update_job(job_id, status=FAILED, error=f"Error: {e}")
+        return
+    logger.info(f"Job {job_id} ({file_name}) done in {time.perf_counter() - start:.1f}s")
+    _update_job(job_id, status=DONE, stage="Done", progress=1.0, rows=len(result))
+
+
+def submit_job(uploaded_file, template, owner):
+    """Queue an uploaded workbook for processing and return the job id.
+
+    ``owner`` is the token of the browser session the job belongs to (kept in
+    the page URL, so it survives reloads); only that owner lists it. Submitting the same file for the same template while the
+    owner's earlier job for it is still queued or running returns that job
+    instead of starting another, so a page rerun never restarts work in flight.
+    """
+    if template not in PROCESSORS:
+        raise ValueError(f"Unknown template: {template}")
+    content = uploaded_file.getvalue()
+    file_name = getattr(uploaded_file, "name", "") or "upload.xlsx"
+    content_key = hashlib.sha256(content + template.encode()).hexdigest()
+    executor = get_job_executor()
+    _expire_jobs()
+
+    with _db_lock, closing(_connect()) as connection, connection:
+        existing = connection.execute(
+            "SELECT id FROM jobs WHERE owner = ? AND content_key = ? AND status IN (?, ?)",
+            (owner, content_key, *ACTIVE_STATUSES),
+        ).fetchone()
+        if existing is not None:
+            return existing["id"]
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connection.execute(
+            "INSERT INTO jobs (id, owner, content_key, template, file_name, status, stage, "
+            "created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, owner, content_key, template, file_name, QUEUED, "Queued", now, now),
+        )
+    executor.submit(_run_job, job_id, content, file_name, template)
+    return job_id
+
+
+def get_job(job_id):
+    with closing(_connect()) as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def list_jobs(owner, include_reviewed=False, limit=50):
+    """The owner's most recent jobs first; by default those not reviewed yet."""
+    query = "SELECT * FROM jobs WHERE owner = ?"
+    if not include_reviewed:
+        query += " AND reviewed = 0"
+    query += " ORDER BY created DESC LIMIT ?"
+    with closing(_connect()) as connection:
+        return [dict(row) for row in connection.execute(query, (owner, limit))]
+
+
+def load_job_result(job_id):
+    """DataFrame produced by a finished job."""
+    with open(_result_path(job_id), "rb") as f:
+        return pickle.load(f)
+
+
+def mark_job_reviewed(job_id):
+    """Hide a job from the queue and drop its stored result.
+
+    Called once the result is inserted or the user dismisses the job, never
+    on opening it for review, so the result survives Back and reloads.
+    """
+    _update_job(job_id, reviewed=1)
+    _remove_result(job_id)
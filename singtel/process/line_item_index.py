@@ -0,0 +1,375 @@
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+LINE_ITEM_INDEX_FILE = "line_item_index.pickle"
+ARTIFACT_VERSION = 1
+# Buckets for document frequencies. Each posting also keeps 16 more bits of
+# the feature's hash, so features that merely share a bucket never match.
+INDEX_DIMENSIONS = 2**22
+FINGERPRINT_BITS = 16
+# Query features present in more than this share of texts ("ion", "and", ...)
+# barely discriminate but dominate the work, so they are skipped
+MAX_DF_FRACTION = 0.3
+# Rows read from singtel_data per sync query
+SYNC_BATCH_ROWS = 50_000
+LINE_ITEM_INDEX_SYNC_SECONDS = float(os.environ.get("LINE_ITEM_INDEX_SYNC_SECONDS", "5"))
+LINE_ITEM_INDEX_SAVE_SECONDS = float(os.environ.get("LINE_ITEM_INDEX_SAVE_SECONDS", "30"))
+TOKEN_PATTERN = r"[a-z0-9]+"
+
+
+def _normalize_text(item, description):
+    text = f"{item or ''} {description or ''}"
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def text_features(texts):
+    """Hashed features of ``texts`` as (text position, feature, weight) arrays.
+
+    Features are the words and the character trigrams of each word (padded,
+    so "router" and "routers" share " ro", "rou", ... "ter"), as
+    ``bucket << FINGERPRINT_BITS | fingerprint`` of their 64-bit hash.
+    Weights are sublinear term frequencies, 1 + log(tf). Each distinct word
+    is hashed once, whatever the number of texts it occurs in.
+    """
+    words = pd.Series(list(texts), dtype=object).str.findall(TOKEN_PATTERN).explode().dropna()
+    empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32))
+    if words.empty:
+        return empty
+    vocab = pd.Index(words.unique())
+    grams, owner = [], []
+    for position, word in enumerate(vocab):
+        padded = f" {word} "
+        grams.append(f"w:{word}")
+        grams.extend(f"g:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        owner.extend([position] * (len(padded) - 1))
+    hashed = pd.util.hash_array(np.asarray(grams, dtype=object))
+    hashed = (
+        (hashed % INDEX_DIMENSIONS) << FINGERPRINT_BITS | hashed >> (64 - FINGERPRINT_BITS)
+    ).astype(np.int64)
+
+    # Expand every word occurrence into its vocabulary word's features
+    counts = np.bincount(np.asarray(owner), minlength=len(vocab))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    codes = vocab.get_indexer(words.to_numpy())
+    per_word = counts[codes]
+    offsets = np.arange(per_word.sum()) - np.repeat(np.cumsum(per_word) - per_word, per_word)
+    features = hashed[np.repeat(starts[codes], per_word) + offsets]
+    positions = np.repeat(words.index.to_numpy().astype(np.int64), per_word)
+
+    feature_space = INDEX_DIMENSIONS << FINGERPRINT_BITS
+    keys, tf = np.unique(positions * feature_space + features, return_counts=True)
+    return keys // feature_space, keys % feature_space, (1 + np.log(tf)).astype(np.float32)
+
+
+class LineItemIndex:
+    """Inverted index of singtel_data line items for text-similarity lookups.
+
+    Each distinct item + description text is indexed once and remembers the
+    ids of its rows. Postings are kept sorted by feature in a main segment
+    plus a small tail for recent inserts, merged into the main one once it
+    outgrows a tenth of it. Scores are tf-idf cosine similarities. Document
+    frequencies are kept per feature, so idf is always current on the query
+    side; document norms are recomputed with it on every merge.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.texts = []
+        self.rows = []
+        self.last_id = 0
+        self.anchor_text = None
+        self._text_ids = {}
+        self.doc_freq = np.zeros(INDEX_DIMENSIONS, dtype=np.int32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self._main = (np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.float32))
+        self._tail = (np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.float32))
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.rows)
+
+    def add(self, ids, items, descriptions):
+        """Index rows (ids in increasing order, after ``last_id``)."""
+        new_texts = []
+        with self._lock:
+            for row_id, item, description in zip(ids, items, descriptions):
+                row_id = int(row_id)
+                text = _normalize_text(item, description)
+                text_id = self._text_ids.get(text)
+                if text_id is None:
+                    text_id = len(self.texts)
+                    self._text_ids[text] = text_id
+                    self.texts.append(text)
+                    self.rows.append([])
+                    new_texts.append(text)
+                self.rows[text_id].append(row_id)
+                self.last_id = max(self.last_id, row_id)
+                if row_id == self.last_id:
+                    self.anchor_text = text
+            if not new_texts:
+                return 0
+            first = len(self.texts) - len(new_texts)
+            positions, features, weights = text_features(new_texts)
+            text_ids = (positions + first).astype(np.int32)
+            np.add.at(self.doc_freq, features >> FINGERPRINT_BITS, 1)
+            weighted = weights * self._idf(features)
+            norms = np.sqrt(np.bincount(positions, weighted**2, minlength=len(new_texts)))
+            self.norms = np.concatenate([self.norms, norms.astype(np.float32)])
+            self._tail = _merge_segments(self._tail, (features, text_ids, weights))
+            if len(self._tail[0]) > max(100_000, len(self._main[0]) // 10):
+                self._merge()
+            return len(new_texts)
+
+    def _idf(self, features):
+        doc_freq = self.doc_freq[features >> FINGERPRINT_BITS]
+        return np.log((1 + len(self.texts)) / (1 + doc_freq)) + 1
+
+    def _merge(self):
+        features, text_ids, weights = _merge_segments(self._main, self._tail)
+        weighted = weights * self._idf(features)
+        self.norms = np.sqrt(
+            np.bincount(text_ids, weighted**2, minlength=len(self.texts))
+        ).astype(np.float32)
+        self._main = (features, text_ids, weights)
+        self._tail = tuple(column[:0] for column in self._tail)
+
+    def search(self, text, k=10):
+        """Up to ``k`` rows most similar to ``text``, as (id, score, text), best first.
+
+        Rows sharing a text share its score; the newest come first.
+        """
+        _, features, weights = text_features([_normalize_text(text, "")])
+        with self._lock:
+            n_texts = len(self.texts)
+            if not n_texts or not len(features):
+                return []
+            doc_freq = self.doc_freq[features >> FINGERPRINT_BITS]
+            keep = doc_freq > 0
+            common = doc_freq > MAX_DF_FRACTION * n_texts
+            if (keep & ~common).any():
+                keep &= ~common
+            features, weights = features[keep], weights[keep]
+            if not len(features):
+                return []
+            idf = self._idf(features)
+            query_weights = weights * idf**2
+            query_norm = np.sqrt(np.sum((weights * idf) ** 2))
+
+            scored_texts, contributions = [], []
+            for segment_features, segment_texts, segment_weights in (self._main, self._tail):
+                lo = np.searchsorted(segment_features, features, "left")
+                lengths = np.searchsorted(segment_features, features, "right") - lo
+                # Positions lo[i] .. lo[i] + lengths[i] - 1 of every query feature
+                index = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+                index += np.arange(lengths.sum())
+                scored_texts.append(segment_texts[index])
+                contributions.append(segment_weights[index] * np.repeat(query_weights, lengths))
+
+            scores = np.bincount(
+                np.concatenate(scored_texts),
+                np.concatenate(contributions),
+                minlength=n_texts,
+            )
+            scores /= self.norms.astype(np.float64) * query_norm + 1e-12
+            top = min(k, n_texts)
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results = []
+            for text_id in best:
+                if scores[text_id] <= 0 or len(results) >= k:
+                    break
+                for row_id in reversed(self.rows[text_id]):
+                    results.append((row_id, float(scores[text_id]), self.texts[text_id]))
+                    if len(results) >= k:
+                        break
+            return results
+
+    def sync(self, read_rows):
+        """Index rows added to singtel_data since the last sync; returns how many.
+
+        ``read_rows(after_id, limit)`` returns id, item and description of the
+        next ``limit`` rows with a larger id, as a DataFrame or an iterable of
+        DataFrame chunks; None, or no chunks at all, when the query failed. If
+        the last indexed row is gone or changed (the table was truncated), the
+        index starts over.
+        """
+        if self.last_id:
+            anchor = list(_chunks(read_rows(self.last_id - 1, 1)))
+            if not anchor:
+                return 0
+            anchor = anchor[0]
+            if (
+                anchor.empty
+                or int(anchor.iloc[0]["id"]) != self.last_id
+                or _normalize_text(anchor.iloc[0]["item"], anchor.iloc[0]["description"])
+                != self.anchor_text
+            ):
+                logger.info("singtel_data was rewritten, rebuilding line item index")
+                with self._lock:
+                    self.clear()
+        added = 0
+        while True:
+            batch_rows = 0
+            for rows in _chunks(read_rows(self.last_id, SYNC_BATCH_ROWS)):
+                if not rows.empty:
+                    self.add(rows["id"], rows["item"], rows["description"])
+                    batch_rows += len(rows)
+            added += batch_rows
+            if batch_rows < SYNC_BATCH_ROWS:
+                return added
+
+    def save(self, path):
+        with self._lock:
+            self._merge()
+            state = {
+                "version": ARTIFACT_VERSION,
+                "dimensions": INDEX_DIMENSIONS,
+                "texts": self.texts,
+                "rows": self.rows,
+                "last_id": self.last_id,
+                "anchor_text": self.anchor_text,
+                "doc_freq": self.doc_freq,
+                "norms": self.norms,
+                "main": self._main,
+            }
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The saved index, or an empty one if there is none or it is outdated."""
+        index = cls()
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return index
+        if state.get("version") != ARTIFACT_VERSION or state.get("dimensions") != INDEX_DIMENSIONS:
+            return index
+        index.texts = state["texts"]
+        index.rows = state["rows"]
+        index.last_id = state["last_id"]
+        index.anchor_text = state["anchor_text"]
+        index.doc_freq = state["doc_freq"]
+        index.norms = state["norms"]
+        index._main = state["main"]
+        index._text_ids = {text: text_id for text_id, text in enumerate(index.texts)}
+        return index
+
+
+def _chunks(result):
+    """A read_rows result as an iterable of DataFrames, empty when the read failed."""
+    if result is None:
+        return []
+    if isinstance(result, pd.DataFrame):
+        return [result]
+    return result
+
+
+def _merge_segments(first, second):
+    """Two (features, text ids, weights) segments as one, sorted by feature."""
+    merged = [np.concatenate([a, b]) for a, b in zip(first, second)]
+    order = np.argsort(merged[0], kind="stable")
+    return tuple(column[order] for column in merged)
+
+
+ROWS_AFTER_QUERY = (
+    "SELECT id, item, description FROM singtel_data WHERE id > %s ORDER BY id LIMIT %s"
+)
+
+
+def db_row_reader(connection):
+    """``read_rows`` for LineItemIndex.sync over a psycopg2 connection or pool.
+
+    Rows are streamed in chunks through a server-side cursor (stream_query),
+    so even a full build holds one chunk of rows at a time.
+    """
+    from singtel.db.db_connection import stream_query
+
+    def read_rows(after_id, limit):
+        try:
+            yield from stream_query(connection, ROWS_AFTER_QUERY, (after_id, limit))
+        except Exception as e:
+            logger.warning(f"Could not read line items for the index: {e}")
+
+    return read_rows
+
+
+_index = None
+_index_lock = threading.Lock()
+_synced_at = 0.0
+_saved_at = 0.0
+# One worker, so background refreshes run one after the other
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="line-item-index")
+
+
+def get_line_item_index():
+    """Process-wide index, loaded from the cache directory on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                start = time.perf_counter()
+                _index = LineItemIndex.load(get_cache_path(LINE_ITEM_INDEX_FILE))
+                logger.info(
+                    f"Line item index loaded ({len(_index)} rows) in "
+                    f"{time.perf_counter() - start:.3f}s"
+                )
+    return _index
+
+
+def refresh_line_item_index(read_rows, force=False):
+    """Sync the shared index with singtel_data and persist it.
+
+    Without ``force`` the database is checked at most every
+    LINE_ITEM_INDEX_SYNC_SECONDS; the file is rewritten at most every
+    LINE_ITEM_INDEX_SAVE_SECONDS. Rows not yet saved are simply read again
+    after a restart.
+    """
+    global _synced_at, _saved_at
+    index = get_line_item_index()
+    with _index_lock:
+        now = time.monotonic()
+        if not force and now - _synced_at < LINE_ITEM_INDEX_SYNC_SECONDS:
+            return index
+        _synced_at = now
+        added = index.sync(read_rows)
+        if added and (force or now - _saved_at >= LINE_ITEM_INDEX_SAVE_SECONDS):
+            index.save(get_cache_path(LINE_ITEM_INDEX_FILE))
+            _saved_at = now
+        if added:
+            logger.info(f"Line item index: {added} rows added, {len(index)} indexed")
+    return index
+
+
+def _refresh_and_log(read_rows):
+    try:
+        refresh_line_item_index(read_rows, force=True)
+    except Exception:
+        logger.exception("Line item index refresh failed")
+
+
+def refresh_line_item_index_in_background(read_rows):
+    """Queue a forced refresh_line_item_index on a background thread.
+
+    For after an insert: the rows are committed by then, so building a cold
+    index or failing to save it must neither hold up nor break the request.
+    Errors are logged; the next refresh picks up whatever was missed.
+    """
+    return _refresher.submit(_refresh_and_log, read_rows)
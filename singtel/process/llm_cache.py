@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_FILE = "llm_cache.sqlite3"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Bump to drop every cached response regardless of template changes.
+LLM_CACHE_VERSION = 1
+
+
+def template_version(*templates):
+    """Short hash of prompt templates, so editing a prompt invalidates its entries."""
+    digest = hashlib.sha256(str(LLM_CACHE_VERSION).encode())
+    for template in templates:
+        digest.update(template.encode())
+    return digest.hexdigest()[:12]
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if hasattr(value, "tolist"):
+        return _normalize(value.tolist())
+    return value
+
+
+def prompt_fingerprint(kind, version, model, temperature, **parts):
+    """Stable key for an LLM call built from its inputs rather than the raw prompt.
+
+    Strings are kept verbatim: the mapping refers to header names exactly, so
+    ``"Qty "`` and ``"Qty"`` must not share an entry.
+    """
+    payload = {
+        "kind": kind,
+        "version": version,
+        "model": model,
+        "temperature": temperature,
+        "parts": _normalize(parts),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LLMResponseCache:
+    """Size-bounded, least-recently-used response cache persisted in sqlite."""
+
+    def __init__(self, path, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key):
+        with self._lock, self._connect() as connection:
+            row = connection.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            connection.execute(
+                "UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._stats["hits"] += 1
+            return row[0]
+
+    def set(self, key, response, kind=""):
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, response, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, kind, response, now, now),
+            )
+            evicted = connection.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._stats["writes"] += 1
+            self._stats["evictions"] += max(evicted, 0)
+
+    def clear(self):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(get_cache_path(LLM_CACHE_FILE))
+    return _llm_cache
+
+
+def set_llm_cache(cache):
+    """Replace the process-wide cache (e.g. with a temporary file in tests)."""
+    global _llm_cache
+    _llm_cache = cache
+
+
+def cached_completion(kind, version, model, temperature, key_parts, call, is_valid=None):
+    """Return ``call()``'s text, served from the cache when the inputs were seen before.
+
+    ``is_valid`` guards what gets stored, so an unparseable reply is retried
+    next time instead of being replayed forever.
+    """
+    cache = get_llm_cache()
+    key = prompt_fingerprint(kind, version, model, temperature, **key_parts)
+    response = cache.get(key)
+    if response is not None:
+        logger.info(f"LLM cache hit for {kind}")
+        return response
+
+    response = call()
+    if is_valid is None or is_valid(response):
+        cache.set(key, response, kind=kind)
+    return response
@@ -0,0 +1,185 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import httpx
+import openai
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "60"))
+LLM_DEADLINE = float(os.environ.get("LLM_DEADLINE", "180"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "20"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call, retries included, did not finish within its deadline."""
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LLMClient:
+    """One OpenAI client per process: keep-alive connections, retries, metrics.
+
+    ``base_url`` defaults to OPENAI_BASE_URL, so the whole wrapper can be
+    pointed at a local OpenAI-compatible fake server.
+    """
+
+    def __init__(
+        self,
+        base_url=None,
+        api_key=None,
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        deadline=LLM_DEADLINE,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+        history=500,
+    ):
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client = OpenAI(
+            base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+            api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+            timeout=request_timeout,
+            # Retries are ours, so they share one deadline and one backoff policy.
+            max_retries=0,
+            http_client=httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+                timeout=request_timeout,
+            ),
+        )
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=history)
+        self._totals = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "latency_seconds": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)].
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def chat(self, messages, model, temperature=0, deadline=None, gate=None, **kwargs):
+        """``chat.completions.create`` with retries on 429/5xx/connection errors.
+
+        ``gate`` is a context manager factory entered around each attempt (e.g.
+        llm_executor.llm_slot), so backoff sleeps between retries hold nothing.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._record(model, start, None, attempt, failed=True)
+                raise LLMDeadlineExceeded(
+                    f"LLM call exceeded its {deadline or self.deadline:g}s deadline"
+                )
+            try:
+                with gate() if gate is not None else nullcontext():
+                    # Waiting at the gate counts against the deadline too
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMDeadlineExceeded(
+                            f"LLM call exceeded its {deadline or self.deadline:g}s deadline"
+                        )
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=min(self.request_timeout, remaining),
+                        **kwargs,
+                    )
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self._record(model, start, None, attempt, failed=True)
+                    raise
+                sleep_for = min(self._backoff(attempt), max(deadline_at - time.monotonic(), 0))
+                logger.warning(
+                    f"LLM call failed ({type(e).__name__}), retry {attempt + 1} in {sleep_for:.1f}s"
+                )
+                time.sleep(sleep_for)
+                attempt += 1
+                continue
+
+            self._record(model, start, response, attempt)
+            return response
+
+    def _record(self, model, start, response, retries, failed=False):
+        latency = time.perf_counter() - start
+        usage = getattr(response, "usage", None)
+        metric = {
+            "model": model,
+            "latency_seconds": latency,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "retries": retries,
+            "failed": failed,
+        }
+        with self._lock:
+            self._calls.append(metric)
+            self._totals["calls"] += 1
+            self._totals["failures"] += int(failed)
+            self._totals["retries"] += retries
+            self._totals["latency_seconds"] += latency
+            self._totals["prompt_tokens"] += metric["prompt_tokens"]
+            self._totals["completion_tokens"] += metric["completion_tokens"]
+        logger.info(
+            f"LLM call {model}: {latency:.2f}s, {metric['prompt_tokens']} prompt + "
+            f"{metric['completion_tokens']} completion tokens, {retries} retries"
+        )
+
+    def metrics(self):
+        """Totals since start plus the most recent per-call metrics."""
+        with self._lock:
+            totals = dict(self._totals)
+            recent = list(self._calls)
+        totals["avg_latency_seconds"] = (
+            totals["latency_seconds"] / totals["calls"] if totals["calls"] else 0.0
+        )
+        totals["recent"] = recent
+        return totals
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+def set_llm_client(client):
+    """Replace the shared client, e.g. with one pointed at a fake server."""
+    global _client
+    _client = client
@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from .llm_client import LLM_DEADLINE
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "120"))
+# The client gets the same deadline (see llm_deadline), so an abandoned call stops retrying too
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", str(LLM_DEADLINE)))
+
+
+class LLMTimeoutError(TimeoutError):
+    """An LLM call ran longer than its timeout."""
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+# Shared by every upload in the process, so concurrent sessions together stay
+# under the provider's limits.
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE / 60, max(LLM_MAX_CONCURRENCY, 1))
+
+
+# Timeout and start callback of the run_concurrently call the current thread works for
+_current = threading.local()
+
+
+@contextmanager
+def llm_slot():
+    """Hold a concurrency slot and a rate-limit token for one LLM request.
+
+    Meant as LLMClient.chat's ``gate``, so it is taken per attempt and not
+    held through backoff sleeps between retries. Cache lookups belong
+    outside, so hits use up neither slots nor tokens.
+    """
+    with _slots:
+        _bucket.acquire()
+        on_start = getattr(_current, "on_start", None)
+        if on_start is not None:
+            on_start()
+        yield
+
+
+def llm_deadline():
+    """Deadline in seconds for the current thread's LLM call.
+
+    The run_concurrently timeout when called from one of its calls, else
+    None (the client's default).
+    """
+    return getattr(_current, "timeout", None)
+
+
+def _run(call, started, index, timeout):
+    _current.timeout = timeout
+    # The first network call of ``call`` starts its timeout
+    _current.on_start = lambda: started.setdefault(index, time.monotonic())
+    try:
+        return call()
+    finally:
+        _current.timeout = _current.on_start = None
+
+
+def run_concurrently(calls, timeout=LLM_CALL_TIMEOUT, return_exceptions=False):
+    """Run independent zero-argument callables concurrently, results in input order.
+
+    Concurrency and request rate are bounded process-wide, for the network
+    calls the callables make through llm_slot. ``timeout`` counts from the
+    first such call, not from when the callable was queued, and is also the
+    client's deadline for it. A call that times out is abandoned (its thread
+    stops once the client gives up) and yields LLMTimeoutError. With
+    ``return_exceptions`` errors are returned in place of results, otherwise
+    the first failure in input order is raised.
+
+    The callables should be leaf LLM calls; one that fans out again from inside
+    this pool can exhaust the shared slots.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+
+    start = time.perf_counter()
+    started = {}
+    results = [None] * len(calls)
+    executor = ThreadPoolExecutor(
+        max_workers=min(len(calls), LLM_MAX_CONCURRENCY), thread_name_prefix="llm"
+    )
+    try:
+        futures = {
+            executor.submit(_run, call, started, i, timeout): i for i, call in enumerate(calls)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = e
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                if index in started and now - started[index] > timeout:
+                    results[index] = LLMTimeoutError(
+                        f"LLM call {index} exceeded {timeout:g}s"
+                    )
+                    pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(
+        f"Ran {len(calls)} LLM calls in {time.perf_counter() - start:.2f}s "
+        f"(concurrency {LLM_MAX_CONCURRENCY})"
+    )
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+    return results
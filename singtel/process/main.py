@@ -6,10 +6,9 @@ import pandas as pd
 from .utility import (
     apply_restriction_on_c_df,
     apply_restriction_on_df,
-    city_country_mapped_list,
     contains_bom_or_missing_price,
     convert_str_to_dict,
-    convert_to_usd,
+    enrich_from_quotation,
     get_end_of_table,
     get_header,
     get_mapping,
@@ -17,31 +16,39 @@ from .utility import (
     get_response,
     get_rest_data_map,
     has_valid_header,
-    update_city_country,
     update_city_value,
     update_country_value,
-    update_row,
     update_unit_cost,
-    get_images_from_uploaded_file,
-    extract_text_from_image
 )
-from io import BytesIO
-from PIL import Image as PILImage
+from .chunked_extraction import extract_chunks, split_into_chunks
+from .exchange_rate import convert_column_to_usd
+from .gazetteer import resolve_city_country
+from .header_mapper import log_header_mapping_stats
+from .llm_executor import run_concurrently
+from .numeric import NUMERIC_COLUMNS, normalize_numeric_columns
+from .ocr import extract_text_from_images
+from .workbook import load_uploaded_workbook, log_workbook_stats
 
+# Sheets holding terms, assumptions or bills of material rather than priced lines
+NON_DATA_SHEET_PATTERN = "terms|condition|sow|assumption|change|bom"
 
-def process_format_a(uploaded_file):
-    images = get_images_from_uploaded_file(uploaded_file)
-    image_text = []
+
+def report_progress(progress, stage, fraction):
+    """Forward a processing stage to the optional ``progress(stage, fraction)`` callback."""
+    if progress is not None:
+        progress(stage, fraction)
+
+
+def process_format_a(uploaded_file, progress=None):
+    report_progress(progress, "Reading workbook", 0.05)
+    workbook = load_uploaded_workbook(uploaded_file, with_images=True)
+    images = workbook.images()
+    report_progress(progress, "Reading logos", 0.15)
 
     # code to get the name from image
-    for i, img in enumerate(images):
-        img_byte_arr = BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        pil_image = PILImage.open(BytesIO(img_byte_arr.getvalue()))
-        text = extract_text_from_image(pil_image)
-        image_text.append(text)
-    
-    df = pd.read_excel(uploaded_file, sheet_name=0)
+    image_text = extract_text_from_images(images)
+
+    df = workbook.sheet(0)
     df = df.fillna("")
 
     # Step 1: Identify the row from the excel which is having the column header
@@ -76,14 +83,21 @@ def process_format_a(uploaded_file):
         "Unit Cost (USD)",
     ]
 
-    mapped_dict = get_mapping(
-        header, desired_columns, df.iloc[header_index + 2].to_string(index=False),
+    sample_row = df.iloc[header_index + 2].to_string(index=False)
+    rest_data_csv = rest_data_df.to_csv()
+    report_progress(progress, "Mapping columns", 0.4)
+    # The header mapping and the rest-of-page mapping are independent LLM calls
+    mapped_dict, rest_data = run_concurrently(
+        [
+            lambda: get_mapping(header, desired_columns, sample_row),
+            lambda: get_rest_data_map(rest_data_csv, desired_columns, image_text),
+        ]
     )
     mapped_dict = convert_str_to_dict(mapped_dict)
-    rest_data = get_rest_data_map(rest_data_df.to_csv(), desired_columns, image_text)
     rest_data = convert_str_to_dict(rest_data)
 
     # Step 5: Generate the destination table data
+    report_progress(progress, "Cleaning data", 0.8)
     df_destination = df.iloc[header_index:end_table_row_index]
     df_destination.columns = df_destination.iloc[0]
     df_destination = df_destination[1:]
@@ -106,37 +120,32 @@ def process_format_a(uploaded_file):
             new_df[col] = value
 
     new_df = apply_restriction_on_df(new_df)
-    city_to_country, country_list = city_country_mapped_list()
-    new_df = new_df.apply(
-        update_city_country,
-        axis=1,
-        city_to_country=city_to_country,
-        country_list=country_list,
-    )
+    new_df = resolve_city_country(new_df)
     new_df = update_unit_cost(new_df)
-    new_df["Unit Cost (USD)"] = new_df.apply(
-        lambda row: convert_to_usd(row["Unit Cost"], row["Currency"]), axis=1
+    new_df["Unit Cost (USD)"] = convert_column_to_usd(
+        new_df["Unit Cost"], new_df["Currency"]
     )
+    # Learned by the header mapper once the user accepts the upload
+    new_df.attrs["header_mappings"] = [(header, mapped_dict)]
+    log_workbook_stats(workbook)
+    log_header_mapping_stats()
     return new_df
 
 
-def process_format_b(uploaded_file):
-    sheets = pd.read_excel(uploaded_file, sheet_name=None)
-    df_str = ""
+def process_format_b(uploaded_file, progress=None):
+    report_progress(progress, "Reading workbook", 0.05)
+    workbook = load_uploaded_workbook(uploaded_file)
+    sheets = workbook.sheets()
+    sheet_texts = []
     for sheet in sheets:
-        is_match = re.search(
-            "terms|condition|sow|assumption|change|bom", sheet, re.IGNORECASE
-        )
+        is_match = re.search(NON_DATA_SHEET_PATTERN, sheet, re.IGNORECASE)
         if not is_match:
             df = pd.DataFrame(sheets[sheet])
             df = df.fillna("")
             df = df.dropna()
             df = df.replace({"^x$": "0"}, regex=True)
 
-            df_str += df.to_string(header=False, index=False)
-
-    df_str = re.sub("\n", "\n\n", df_str)
-    df_str = re.sub("\n[\s]+\n", "", df_str)
+            sheet_texts.append(df.to_string(header=False, index=False))
 
     desired_columns = [
         "Date",
@@ -153,18 +162,25 @@ def process_format_b(uploaded_file):
         "Unit Cost",
         "Unit Cost (USD)",
     ]
-    response = get_response(df_str, desired_columns)
+    # Large workbooks are split by sheet and row block, extracted concurrently and merged
+    chunks = split_into_chunks(sheet_texts)
+    report_progress(progress, "Extracting line items", 0.2)
+    response = extract_chunks(chunks, desired_columns, get_response)
+    report_progress(progress, "Cleaning data", 0.9)
+    response = normalize_numeric_columns(response, NUMERIC_COLUMNS)
     response = response.drop(response[response["Total Cost"] == 0].index).reset_index()
+    log_workbook_stats(workbook)
 
     return response
 
 
-def process_format_c(uploaded_file):
+def process_format_c(uploaded_file, progress=None):
+    report_progress(progress, "Reading workbook", 0.05)
     sheet_data = {}
     quotation_sheet_data = {}
-    excel_file = pd.ExcelFile(uploaded_file)
-    for sheet_name in excel_file.sheet_names:
-        df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+    workbook = load_uploaded_workbook(uploaded_file)
+    for sheet_name in workbook.sheet_names:
+        df = workbook.sheet(sheet_name)
         df = df.fillna("")
         is_header = False
 
@@ -212,18 +228,26 @@ def process_format_c(uploaded_file):
         "Unit Cost",
         "Unit Cost (USD)",
     ]
+    mapping_calls = []
     for key, value in sheet_data.items():
         df = value["df"]
         header = value["header"]
         header_index = value["header_index"]
-
-        mapped_dict = get_mapping_data(
-            header, desired_columns, df.iloc[header_index + 2].to_string(index=False)
+        sample_row = df.iloc[header_index + 2].to_string(index=False)
+        mapping_calls.append(
+            lambda header=header, sample_row=sample_row: get_mapping_data(
+                header, desired_columns, sample_row
+            )
         )
-        mapped_dict = convert_str_to_dict(mapped_dict)
-        sheet_data[key]["mapped_dict"] = mapped_dict
+
+    # One LLM call per sheet, fired concurrently
+    report_progress(progress, "Mapping columns", 0.3)
+    for key, mapped_dict in zip(sheet_data, run_concurrently(mapping_calls)):
+        sheet_data[key]["mapped_dict"] = convert_str_to_dict(mapped_dict)
 
     # Work on quotation Sheet Data:
+    report_progress(progress, "Merging sheets", 0.7)
+    quotation_df = None
     keys = quotation_sheet_data.keys()
     if len(keys) > 0:
         key = list(keys)[0]
@@ -277,13 +301,13 @@ def process_format_c(uploaded_file):
                 new_df[new_col] = ""
 
         # Add the rest data from quotation sheet
-        new_df = new_df.apply(lambda row: update_row(row, quotation_df), axis=1)
+        new_df = enrich_from_quotation(new_df, quotation_df)
 
         new_df = apply_restriction_on_c_df(new_df)
         new_df = update_unit_cost(new_df)
         new_df["Currency"] = "USD"
-        new_df["Unit Cost (USD)"] = new_df.apply(
-            lambda row: convert_to_usd(row["Unit Cost"], row["Currency"]), axis=1
+        new_df["Unit Cost (USD)"] = convert_column_to_usd(
+            new_df["Unit Cost"], new_df["Currency"]
         )
         df_list.append(new_df)
 
@@ -292,5 +316,18 @@ def process_format_c(uploaded_file):
     combined_df["City"] = combined_df["City"].apply(update_city_value)
     combined_df["Country"] = combined_df["Country"].apply(update_country_value)
     combined_df = combined_df.drop("Match Key", axis=1)
+    combined_df.attrs["header_mappings"] = [
+        (value["header"], value["mapped_dict"]) for value in sheet_data.values()
+    ]
+    log_workbook_stats(workbook)
+    log_header_mapping_stats()
 
     return combined_df
+
+
+# Processor per upload template, as offered on the upload page
+PROCESSORS = {
+    "Template A": process_format_a,
+    "Template B": process_format_b,
+    "Template C": process_format_c,
+}
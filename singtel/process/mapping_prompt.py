@@ -0,0 +1,34 @@
+# Map sheet headers onto the desired columns (get_mapping / get_mapping_data)
+header_mapping_template = """
+    header: {header}
+    desired columns: {desired_columns}
+    sample_raw_data: {row_data}
+
+    Provide the dictionary with mappings where each desired column is associated with its corresponding header from the raw data. If a desired column cannot be mapped, ensure it remains empty.
+    Note: Item column can contain different types of services, hardware, devices and software such as professional services, subscription, routers and cabling etc. Item can be a some material, item but not Id or number.
+    if you are able to identify description in source column then make sure to map it with only description of desired column.
+
+    Example Output: {output}
+    Note: do not provide any other text except the json mentioned above not even ```json.
+    """
+
+# Map the data around the table (title block, footer, logos) onto the desired columns
+rest_data_template = """
+    desired columns: {desired_columns}
+    raw_data: {rest_data_df}
+    suppliers: {suppliers}
+
+    Provide the dictionary with mappings where desired column is associated with its raw data. If a desired column cannot be mapped, ensure it remains empty.
+    Here, we can only map these desired columns: Date, Country, City, Supplier, Quote #, Currency.
+    Please check suppliers if any supplier name found in it and map with Supplier otherwise check throughly for Supplier.
+    Also, Supplier should not be SingTel or Singapore telecommunication or SINGAPORE TELECOM HONG KONG LIMITED and Dataformat should be like "14-Nov-2024"
+    Do not update country or city from company adress or company name.
+    
+    Currency should be in ISO 4217 format (e.g., USD, EUR).
+    Example Output: {output}
+    Note: do not provide any other text except the json mentioned above not even ```json.
+    """
+
+mapping_system_prompt = """
+    You are a helpful assistant specializing in mapping data columns.
+    """
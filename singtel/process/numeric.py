@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import infer_dtype
+
+# Everything before the first digit, the first number (grouped thousands such
+# as "1,234,567.89", "1.234,5", "1'234" or no-break-space groups, or a plain
+# number with optional decimals) and an optional closing parenthesis.
+# Plain spaces are not treated as grouping, "5 200 units" stays 5.
+# Patterns are run by Arrow (RE2) on whole columns, hence plain strings.
+GROUP_SEPARATORS = ",.'\u00a0\u202f"
+NUMBER_PATTERN = (
+    r"\d{1,3}(?:[" + GROUP_SEPARATORS + r"]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+)
+FIRST_NUMBER_PATTERN = rf"^\D*(?P<number>{NUMBER_PATTERN})"
+CELL_PATTERN = rf"^(?P<prefix>\D*)(?P<number>{NUMBER_PATTERN})(?P<close>\s*\))?"
+# Grouping characters other than "," and ".", which every format drops
+OTHER_GROUPING_PATTERN = "['\u00a0\u202f]"
+# The comma is the last separator, e.g. "1.234,5" or "12,5"
+COMMA_LAST_PATTERN = r",\d+$"
+COMMA_GROUPS_PATTERN = r"\d{1,3}(?:,\d{3})+"
+DOT_GROUPS_PATTERN = r"^[^,]*\.[^,]*\."
+# A prefix marking the amount negative: a leading minus or an opening
+# accounting parenthesis, on its own or next to a currency symbol ("$", "S$",
+# "€") or a space-separated code: "-5", "$-5", "USD -5", "(250.00)",
+# "USD (1,200)", "($50)". A dash inside text ("Cat-6") is not a sign.
+CURRENCY_PREFIX = r"(?:[A-Z]{0,2}[$€£¥₹]\s*|[A-Z]{3}\s+)"
+NEGATIVE_PREFIX_PATTERN = rf"^\s*{CURRENCY_PREFIX}?(?:-|\(\s*){CURRENCY_PREFIX}?\s*$"
+ARROW_STRING = pd.ArrowDtype(pa.string())
+ARROW_FLOAT = pd.ArrowDtype(pa.float64())
+# Parsing per unique value only pays off when values repeat this much,
+# judged on every DISTINCT_SAMPLE_STEP-th cell
+MAX_DISTINCT_RATIO = 0.5
+DISTINCT_SAMPLE_STEP = 10
+
+
+def _flags(matches):
+    return matches.to_numpy(dtype=bool, na_value=False)
+
+
+def _to_float(numbers):
+    return numbers.astype(ARROW_FLOAT).to_numpy(dtype=float, na_value=np.nan)
+
+
+def _parse_strings(strings):
+    """First number of each str in an object array, NaN where there is none.
+
+    Every step is a whole-column Arrow string operation; separators and signs
+    are only worked out for the cells that have them.
+    """
+    strings = pd.Series(strings, dtype=object).astype(ARROW_STRING)
+    number = strings.str.extract(FIRST_NUMBER_PATTERN, expand=False)
+    if _flags(number.str.contains(OTHER_GROUPING_PATTERN)).any():
+        number = number.str.replace(OTHER_GROUPING_PATTERN, "", regex=True)
+    # Work out the decimal separator: the last of ",." wins when both appear,
+    # a lone comma is decimal unless it groups thousands, and several dots
+    # are grouping.
+    decimal_comma = _flags(number.str.contains(COMMA_LAST_PATTERN)) & ~_flags(
+        number.str.fullmatch(COMMA_GROUPS_PATTERN)
+    )
+    dot_groups = ~decimal_comma & _flags(number.str.contains(DOT_GROUPS_PATTERN))
+    plain = ~decimal_comma & ~dot_groups
+    values = np.full(len(number), np.nan)
+    values[plain] = _to_float(number[plain].str.replace(",", "", regex=False))
+    if decimal_comma.any():
+        values[decimal_comma] = _to_float(
+            number[decimal_comma]
+            .str.replace(".", "", regex=False)
+            .str.replace(",", ".", regex=False)
+        )
+    if dot_groups.any():
+        values[dot_groups] = _to_float(number[dot_groups].str.replace(".", "", regex=False))
+
+    signed = _flags(strings.str.contains("[-(]")) & ~np.isnan(values)
+    if signed.any():
+        parts = strings[signed].str.extract(CELL_PATTERN)
+        negative = _flags(parts["prefix"].str.match(NEGATIVE_PREFIX_PATTERN)) & (
+            # An opening parenthesis only counts when the amount is closed too
+            ~_flags(parts["prefix"].str.contains("(", regex=False))
+            | _flags(parts["close"].ne(""))
+        )
+        signed[signed] = negative
+        values[signed] = -values[signed]
+    return values
+
+
+def _mostly_repeated(strings):
+    sample = strings[::DISTINCT_SAMPLE_STEP]
+    return len(pd.unique(sample)) <= len(sample) * MAX_DISTINCT_RATIO
+
+
+def parse_numeric(values):
+    """Numeric normalization of a column of mixed cells.
+
+    Numbers pass through (vectorized). Strings yield their first number, with
+    thousands separators (``1,234.50``, ``1.234,50``, ``1'234``), currency
+    symbols or codes (``$1,200``, ``USD 99``), parentheses negatives
+    (``(250.00)``) and decimal commas (``12,5``) understood. Anything else
+    becomes NaN. Strings are parsed with column-wide string operations; a
+    column that repeats a lot is factorized and parsed once per unique value.
+    """
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if values.dtype != object:
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+
+    if infer_dtype(values, skipna=True) == "string":
+        is_string = values.notna().to_numpy()
+    else:
+        is_string = values.map(type).eq(str).to_numpy()
+    output = np.full(len(values), np.nan)
+    if not is_string.all():
+        output[~is_string] = pd.to_numeric(
+            values[~is_string], errors="coerce"
+        ).to_numpy(dtype=float)
+    if is_string.any():
+        strings = values[is_string].to_numpy(dtype=object)
+        if _mostly_repeated(strings):
+            codes, uniques = pd.factorize(strings)
+            output[is_string] = _parse_strings(uniques)[codes]
+        else:
+            output[is_string] = _parse_strings(strings)
+    return pd.Series(output, index=values.index, name=values.name)
+
+
+def normalize_numeric_columns(df, columns):
+    """Parse the given columns in place (those present in ``df``)."""
+    for column in columns:
+        if column in df.columns:
+            df[column] = parse_numeric(df[column])
+    return df
+
+
+# Cost and quantity columns shared by every template's output
+NUMERIC_COLUMNS = ["Total Cost", "QTY", "Unit Cost", "Unit Cost (USD)"]
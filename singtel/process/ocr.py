@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+import easyocr
+import numpy as np
+
+from .storage import get_cache_path
+
+logger = logging.getLogger(__name__)
+
+OCR_LANGUAGES = ["en"]
+
+# One reader per process: loading the detection and recognition models is the
+# expensive part, inference on a single logo is comparatively cheap.
+_reader = None
+_warmup_thread = None
+_load_lock = threading.Lock()
+# easyocr/torch inference is not guaranteed to be re-entrant, serialise it.
+_inference_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "load_seconds": 0.0,
+    "images": 0,
+    "inference_seconds": 0.0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+    "seconds_saved": 0.0,
+}
+
+OCR_CACHE_FILE = "ocr_cache.sqlite3"
+
+
+def get_ocr_reader():
+    """Return the process-wide easyocr reader, loading the models on first use."""
+    global _reader
+    if _reader is None:
+        with _load_lock:
+            if _reader is None:
+                start = time.perf_counter()
+                reader = easyocr.Reader(OCR_LANGUAGES)
+                elapsed = time.perf_counter() - start
+                with _stats_lock:
+                    _stats["load_seconds"] += elapsed
+                logger.info(f"OCR models loaded in {elapsed:.2f}s")
+                _reader = reader
+    return _reader
+
+
+def warm_up_ocr(background=False):
+    """Load the OCR models ahead of the first upload.
+
+    Safe to call on every script rerun: the background loader is started once.
+    """
+    global _warmup_thread
+    if not background:
+        get_ocr_reader()
+        return None
+    with _stats_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(
+                target=get_ocr_reader, name="ocr-warmup", daemon=True
+            )
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def _read_text(reader, image):
+    image_np = np.array(image.convert("RGB"))
+    start = time.perf_counter()
+    result = reader.readtext(image_np, detail=0)
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["inference_seconds"] += elapsed
+    logger.info(f"OCR inference took {elapsed:.2f}s")
+    return " ".join(result), elapsed
+
+
+def extract_text_from_image(image):
+    reader = get_ocr_reader()
+    with _inference_lock:
+        text, _ = _read_text(reader, image)
+    return text
+
+
+def image_content_hash(image):
+    """Hash of the decoded pixels, so re-encoded copies of a logo share a key."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _open_cache():
+    connection = sqlite3.connect(get_cache_path(OCR_CACHE_FILE), timeout=30)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS ocr_cache ("
+        "hash TEXT PRIMARY KEY, text TEXT NOT NULL, seconds REAL NOT NULL)"
+    )
+    return connection
+
+
+def extract_text_from_images(images):
+    """OCR every image of a workbook in one call.
+
+    Images are keyed by content hash: duplicates within the batch are read once
+    and anything seen in an earlier upload is served from the persistent cache.
+    Returns the texts in the same order as ``images``.
+    """
+    if not images:
+        return []
+
+    hashes = [image_content_hash(image) for image in images]
+    unique_hashes = list(dict.fromkeys(hashes))
+
+    connection = _open_cache()
+    try:
+        placeholders = ",".join("?" * len(unique_hashes))
+        rows = connection.execute(
+            f"SELECT hash, text, seconds FROM ocr_cache WHERE hash IN ({placeholders})",
+            unique_hashes,
+        ).fetchall()
+        texts = {row[0]: row[1] for row in rows}
+        saved = sum(row[2] for row in rows)
+
+        misses = [h for h in unique_hashes if h not in texts]
+        if misses:
+            first_image = {}
+            for image_hash, image in zip(hashes, images):
+                first_image.setdefault(image_hash, image)
+            reader = get_ocr_reader()
+            new_rows = []
+            with _inference_lock:
+                for image_hash in misses:
+                    text, elapsed = _read_text(reader, first_image[image_hash])
+                    texts[image_hash] = text
+                    new_rows.append((image_hash, text, elapsed))
+            connection.executemany(
+                "INSERT OR REPLACE INTO ocr_cache (hash, text, seconds) VALUES (?, ?, ?)",
+                new_rows,
+            )
+            connection.commit()
+    finally:
+        connection.close()
+
+    with _stats_lock:
+        _stats["cache_hits"] += len(unique_hashes) - len(misses)
+        _stats["cache_misses"] += len(misses)
+        _stats["seconds_saved"] += saved
+    logger.info(
+        f"OCR batch: {len(images)} images, {len(unique_hashes)} unique, "
+        f"{len(misses)} read, ~{saved:.2f}s saved by cache"
+    )
+    return [texts[h] for h in hashes]
+
+
+def get_ocr_stats():
+    """Model load time and per-image inference time, reported separately."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["loaded"] = _reader is not None
+    stats["avg_inference_seconds"] = (
+        stats["inference_seconds"] / stats["images"] if stats["images"] else 0.0
+    )
+    lookups = stats["cache_hits"] + stats["cache_misses"]
+    stats["cache_hit_rate"] = stats["cache_hits"] / lookups if lookups else 0.0
+    return stats
@@ -1,24 +1,177 @@
+import itertools
+import logging
 import os
-from operator import itemgetter
+import re
+import threading
+import time
+
+import pandas as pd
+import psycopg2
 
 from langchain.chains import create_sql_query_chain
-from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
 from langchain_community.utilities import SQLDatabase
+from langchain_community.utilities.sql_database import truncate_word
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_openai import ChatOpenAI
+from sqlalchemy import MetaData, create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from singtel.db.db_connection import stream_rows
 
+from .line_item_index import refresh_line_item_index
+from .llm_cache import template_version
+from .qa_cache import cached_answer, cached_result, cached_sql, forget_sql
 from .sql_chain_prompt import answer_template, prompt_template, table_info
 from .utility import parse_final_answer, log_output
 
+logger = logging.getLogger(__name__)
 
-def qa_chatbot_response(message, stream_callback=None):
-    # Connect with the database
-    db = SQLDatabase.from_uri(os.environ["DB_URL"])
+QA_MODEL = os.environ.get("QA_MODEL", "gpt-4o")
+QA_TABLE = "singtel_data"
+QA_DB_POOL_SIZE = int(os.environ.get("QA_DB_POOL_SIZE", "5"))
+# Seconds between checks of schema_migrations for a newer schema
+QA_SCHEMA_CHECK_SECONDS = float(os.environ.get("QA_SCHEMA_CHECK_SECONDS", "60"))
+# Questions that get similar line items from the local index in their prompt
+SIMILARITY_PATTERN = re.compile(
+    r"\b(similar|comparable|alternatives?|equivalents?|related|closest|nearest)\b",
+    re.IGNORECASE,
+)
+QA_CANDIDATE_ROWS = int(os.environ.get("QA_CANDIDATE_ROWS", "50"))
+QA_CANDIDATE_MIN_SCORE = float(os.environ.get("QA_CANDIDATE_MIN_SCORE", "0.1"))
+# Most rows of a query result passed on to the answer prompt
+QA_RESULT_MAX_ROWS = int(os.environ.get("QA_RESULT_MAX_ROWS", "1000"))
+# Longer text values are cut at a word, as SQLDatabase.run does
+QA_RESULT_MAX_STRING = 300
+
+_qa_chain = None
+_qa_chain_lock = threading.Lock()
+
+
+def _config_key():
+    return (
+        os.environ["DB_URL"],
+        QA_MODEL,
+        os.environ.get("OPENAI_API_KEY"),
+        os.environ.get("OPENAI_BASE_URL"),
+    )
+
+
+def get_schema_version(engine):
+    """Latest migration applied to the database, 0 when none are recorded."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT max(version) FROM schema_migrations")).scalar() or 0
+    except SQLAlchemyError:
+        return 0
+
+
+def engine_row_reader(engine):
+    """``read_rows`` for LineItemIndex.sync through the chain's SQLAlchemy engine."""
+    query = text(
+        "SELECT id, item, description FROM singtel_data WHERE id > :after_id "
+        "ORDER BY id LIMIT :limit"
+    )
+
+    def read_rows(after_id, limit):
+        try:
+            return pd.read_sql_query(query, engine, params={"after_id": after_id, "limit": limit})
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not read line items for the index: {e}")
+            return None
+
+    return read_rows
+
+
+def _result_rows(engine, query, limit):
+    """Up to ``limit`` rows of ``query`` as tuples, read through a streaming cursor."""
+    if engine.dialect.driver == "psycopg2":
+        connection = engine.raw_connection()
+        try:
+            return list(stream_rows(connection, query, max_rows=limit))
+        finally:
+            connection.close()
+    # Other drivers (e.g. the SQLite database of the benchmarks)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(text(query))
+        if not result.returns_rows:
+            return []
+        return [tuple(row) for row in itertools.islice(result, limit)]
+
+
+def run_sql(engine, query, max_rows=QA_RESULT_MAX_ROWS):
+    """Result of the generated SQL, formatted like QuerySQLDataBaseTool's.
+
+    Rows are streamed and reading stops after ``max_rows`` (noted at the end),
+    so a query without a LIMIT cannot pull the whole table into memory or
+    into the answer prompt. Errors come back as "Error: ..." text.
+    """
+    try:
+        rows = _result_rows(engine, query, max_rows + 1)
+    except (psycopg2.Error, SQLAlchemyError) as e:
+        return f"Error: {e}"
+    if not rows:
+        return ""
+    result = str([
+        tuple(truncate_word(value, length=QA_RESULT_MAX_STRING) for value in row)
+        for row in rows[:max_rows]
+    ])
+    if len(rows) > max_rows:
+        result += f"\n(only the first {max_rows} rows)"
+    return result
+
+
+def similar_line_items(question, read_rows):
+    """Prompt lines of index matches for "similar ..." questions, with their ids.
+
+    Returns ``(text, ids)``; ``text`` is "None" and ``ids`` empty for other
+    questions or when nothing scores above QA_CANDIDATE_MIN_SCORE.
+    """
+    if not SIMILARITY_PATTERN.search(question):
+        return "None", ()
+    index = refresh_line_item_index(read_rows)
+    matches = [
+        match for match in index.search(question, k=QA_CANDIDATE_ROWS)
+        if match[1] >= QA_CANDIDATE_MIN_SCORE
+    ]
+    if not matches:
+        return "None", ()
+    grouped = {}
+    for row_id, _, line_item in matches:
+        grouped.setdefault(line_item, []).append(row_id)
+    lines = [
+        f"ids {', '.join(map(str, ids))}: {line_item[:200]}"
+        for line_item, ids in grouped.items()
+    ]
+    return "\n".join(lines), tuple(match[0] for match in matches)
+
+
+def build_qa_chain(db_url, model=QA_MODEL):
+    """Engine, reflected table info, LLM, prompts and runnable chain for the chatbot.
+
+    Returns a dict with the ``chain`` and the ``engine`` it queries through.
+    Reflection and the sample rows in the table info are read here once;
+    create_sql_query_chain would otherwise re-read them on every question.
+    Generated SQL and query results go through the QA caches, and questions
+    about similar items get candidate rows from the local line item index.
+    """
+    start = time.perf_counter()
+    # Pooled connections, checked before use since the chain lives as long as the process
+    engine = create_engine(db_url, pool_size=QA_DB_POOL_SIZE, pool_pre_ping=True)
+    metadata = MetaData()
+    reflected = SQLDatabase(engine, metadata=metadata, include_tables=[QA_TABLE])
+    db = SQLDatabase(
+        engine,
+        metadata=metadata,
+        include_tables=[QA_TABLE],
+        lazy_table_reflection=True,
+        custom_table_info={QA_TABLE: reflected.get_table_info()},
+    )
+    schema_version = get_schema_version(engine)
 
     # LLM configuration with streaming enabled
-    llm = ChatOpenAI(model="gpt-4o", temperature=0, stream=True)
+    llm = ChatOpenAI(model=model, temperature=0, stream=True)
 
     # query prompt update with values
     prompt = ChatPromptTemplate.from_messages([("system", prompt_template)]).partial(
@@ -26,17 +179,84 @@ def qa_chatbot_response(message, stream_callback=None):
     )
 
     answer_prompt = PromptTemplate.from_template(answer_template)
+    write_answer = answer_prompt | llm | StrOutputParser()
 
-    execute_query = QuerySQLDataBaseTool(db=db) | log_output
+    execute_query = RunnableLambda(lambda query: run_sql(engine, query)) | log_output
     write_query = create_sql_query_chain(llm, db, prompt=prompt) | parse_final_answer
+    # SQL written for another prompt, model, schema or candidate set is never reused
+    sql_version = (template_version(prompt_template), model, schema_version)
+
+    read_rows = engine_row_reader(engine)
+
+    def write_query_cached(inputs, config):
+        candidates, candidate_ids = similar_line_items(inputs["question"], read_rows)
+        inputs = {**inputs, "candidates": candidates}
+        # Streamed like the rest of the chain: the LLM is configured with stream=True
+        return cached_sql(
+            inputs["question"],
+            sql_version + (candidate_ids,),
+            lambda: "".join(write_query.stream(inputs, config)),
+        )
+
+    def execute_query_cached(inputs, config):
+        result = cached_result(
+            inputs["query"], lambda: execute_query.invoke(inputs["query"], config)
+        )
+        if str(result).startswith("Error:"):
+            # Let the LLM write the query afresh next time
+            forget_sql(inputs["question"])
+        return result
+
+    def write_answer_cached(inputs, config):
+        yield from cached_answer(
+            inputs["question"],
+            inputs["query"],
+            inputs["result"],
+            lambda: write_answer.stream(inputs, config),
+        )
+
     chain = (
-            RunnablePassthrough.assign(query=write_query).assign(
-                result=itemgetter("query") | execute_query
+            RunnablePassthrough.assign(query=RunnableLambda(write_query_cached)).assign(
+                result=RunnableLambda(execute_query_cached)
             )
-            | answer_prompt
-            | llm
-            | StrOutputParser()
+            | RunnableLambda(write_answer_cached)
     )
+    logger.info(f"Built QA chain in {time.perf_counter() - start:.2f}s")
+    return {
+        "chain": chain,
+        "engine": engine,
+        "schema_version": schema_version,
+        "checked_at": time.monotonic(),
+    }
+
+
+def get_qa_chain():
+    """The chatbot chain shared by every session in this process.
+
+    Rebuilt only when DB_URL, the model or the OpenAI settings change, or
+    when a newer migration shows up in schema_migrations (checked at most
+    every QA_SCHEMA_CHECK_SECONDS).
+    """
+    global _qa_chain
+    key = _config_key()
+    with _qa_chain_lock:
+        current = _qa_chain
+        if current is not None and current["key"] == key:
+            if time.monotonic() - current["checked_at"] < QA_SCHEMA_CHECK_SECONDS:
+                return current["chain"]
+            current["checked_at"] = time.monotonic()
+            if get_schema_version(current["engine"]) == current["schema_version"]:
+                return current["chain"]
+            logger.info("Database schema changed, rebuilding QA chain")
+        if current is not None:
+            current["engine"].dispose()
+        _qa_chain = build_qa_chain(key[0], key[1])
+        _qa_chain["key"] = key
+        return _qa_chain["chain"]
+
+
+def qa_chatbot_response(message, stream_callback=None):
+    chain = get_qa_chain()
 
     query = message[-1]["content"]
 
@@ -0,0 +1,171 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from singtel.db.db_connection import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Generated SQL only goes stale with the prompt, model or schema (all in its key)
+QA_SQL_CACHE_TTL = float(os.environ.get("QA_SQL_CACHE_TTL", str(24 * 3600)))
+QA_SQL_CACHE_MAX_ENTRIES = int(os.environ.get("QA_SQL_CACHE_MAX_ENTRIES", "1000"))
+# Writes from this process invalidate results at once; the TTL bounds how long
+# writes from other processes (e.g. the batch command) can go unnoticed.
+QA_RESULT_CACHE_TTL = float(os.environ.get("QA_RESULT_CACHE_TTL", "300"))
+QA_RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("QA_RESULT_CACHE_MAX_ENTRIES", "500"))
+
+
+class TTLCache:
+    """In-memory LRU cache whose entries also expire ``ttl`` seconds after being set.
+
+    An entry stored with a ``version`` is only returned to a lookup with the
+    same version; otherwise it counts as invalidated and is dropped.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "expired": 0,
+            "invalidated": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, created_at = entry
+                if time.monotonic() - created_at >= self.ttl:
+                    del self._entries[key]
+                    self._stats["expired"] += 1
+                elif entry_version != version:
+                    del self._entries[key]
+                    self._stats["invalidated"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic())
+            self._entries.move_to_end(key)
+            self._stats["writes"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_sql_cache = TTLCache(QA_SQL_CACHE_MAX_ENTRIES, QA_SQL_CACHE_TTL)
+_result_cache = TTLCache(QA_RESULT_CACHE_MAX_ENTRIES, QA_RESULT_CACHE_TTL)
+# Answers are derived from results, so they share the result settings and version
+_answer_cache = TTLCache(QA_RESULT_CACHE_MAX_ENTRIES, QA_RESULT_CACHE_TTL)
+
+
+def normalize_question(question):
+    """Case, whitespace and trailing punctuation do not change the SQL."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def cached_sql(question, version, write):
+    """SQL for ``question`` from the cache, else ``write()``'s.
+
+    ``version`` identifies the prompt, model and schema the SQL was written
+    for; SQL written for another version is never reused.
+    """
+    key = normalize_question(question)
+    sql = _sql_cache.get(key, version)
+    if sql is not None:
+        logger.info(f"QA SQL cache hit for: {key}")
+        return sql
+    sql = write()
+    if sql:
+        _sql_cache.set(key, sql, version)
+    return sql
+
+
+def forget_sql(question):
+    """Drop the cached SQL for ``question``, e.g. after it failed to run."""
+    _sql_cache.pop(normalize_question(question))
+
+
+def cached_result(sql, run):
+    """Result of ``sql`` from the cache, else ``run()``'s.
+
+    Entries are tied to the singtel_data version, which insert_data,
+    copy_data and drop_all_data bump, so a write invalidates every result.
+    Error messages are not cached.
+    """
+    key = sql.strip()
+    version = get_data_version()
+    result = _result_cache.get(key, version)
+    if result is not None:
+        logger.info("QA result cache hit")
+        return result
+    result = run()
+    if not str(result).startswith("Error:"):
+        _result_cache.set(key, result, version)
+    return result
+
+
+def cached_answer(question, sql, result, write):
+    """Answer chunks: the cached answer in one piece, else ``write()``'s as they stream.
+
+    Keyed by question and SQL and tied to the data version like the result
+    it was written from, so a repeat question needs no LLM call at all.
+    """
+    key = (normalize_question(question), sql.strip())
+    version = get_data_version()
+    answer = _answer_cache.get(key, version)
+    if answer is not None:
+        logger.info(f"QA answer cache hit for: {key[0]}")
+        yield answer
+        return
+    chunks = []
+    for chunk in write():
+        chunks.append(chunk)
+        yield chunk
+    if not str(result).startswith("Error:"):
+        _answer_cache.set(key, "".join(chunks), version)
+
+
+def clear_qa_caches():
+    _sql_cache.clear()
+    _result_cache.clear()
+    _answer_cache.clear()
+
+
+def get_qa_cache_stats():
+    """Hit/miss counts of every level, by level."""
+    return {
+        "sql": _sql_cache.stats(),
+        "result": _result_cache.stats(),
+        "answer": _answer_cache.stats(),
+    }
@@ -14,8 +14,15 @@ CREATE TABLE singtel_data (
     quantity INTEGER,
     hours INTEGER,
     unit_cost NUMERIC(20, 2),
-    unit_cost_usd NUMERIC(20, 2)
+    unit_cost_usd NUMERIC(20, 2),
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('english', coalesce(item, '') || ' ' || coalesce(description, ''))
+    ) STORED
 );
+-- Indexes: GIN trigram on item and on description (serve ILIKE '%term%'),
+-- GIN on search_vector (serves search_vector @@ plainto_tsquery(...)),
+-- B-tree on lower(supplier), lower(country) (serve = and LIKE 'prefix%' on the
+-- lowercased value) and on date.
 """
 # Create the SQL Query
 prompt_template = """
@@ -25,7 +32,7 @@ Please review the following points before creating the query:
     - Convert any plural terms in the question to their singular form before generating the query. For example, "routers" should be converted to "router".
     - Use the `unit_cost_usd` column for all calculations related to total, cost, and average etc.Also, exclude the `currency` column from query.
     - Query only those columns that are needed to answer the question. Wrap each column name in double quotes (") to denote them as delimited identifiers.
-    - Return all columns except "id," since we may need all information.
+    - Return all columns except "id" and "search_vector", since we may need all information.
     - Unless the user specifies a specific number of examples to obtain, query for at most {top_k} results using the LIMIT clause as per {dialect}.
     - For complex queries involving aggregation, calculations, or summaries, include the necessary aggregate functions such as SUM, COUNT, AVG, etc., and ensure the query is syntactically correct.
     - Prioritize the results to return those that are most closely aligned with our query.
@@ -37,15 +44,20 @@ Use the following format:
     SQLQuery: SQL Query
 
 Only use the following tables: {table_info}
+Line items most similar to the question by text, best first (None if not looked up):
+{candidates}
 Question: {input}
 Note:
     1. Search in the item and description columns unless a specific column is provided.
     2. If the query involves cost-related columns, include the currency column in the results as well.
-    3. Use the ILIKE keyword in the query if the question pertains to service or hardware details to match relevant records.
+    3. If the question pertains to service or hardware details, match words and phrases with "search_vector" @@ plainto_tsquery('english', 'words from the question'); it covers both item and description and is indexed. For partial words, model numbers or codes (e.g. 'C9300', 'cat6') use "item" ILIKE '%term%' OR "description" ILIKE '%term%' instead, with at least 3 characters in the term.
     4. If the required information is not found in the item column, check the description column for additional details.
     5. Make sure to include both item and description checks in the query if the question is relevant to both columns.
     6. For queries involving aggregation, apply the necessary aggregate functions (e.g., SUM, COUNT, AVG) and use GROUP BY clauses where appropriate.
     7. Ensure the query uses only the columns present in the table schema to avoid errors and ensure accurate results.
+    8. Keep filtered columns bare so the indexes apply: no LOWER(), UPPER(), casts or string functions around "item", "description" or "date" in the WHERE clause.
+    9. Names may be typed in any case: filter "supplier" and "country" as lower("supplier") = 'singtel' with the name written in lowercase, or lower("supplier") LIKE 'singtel%' when only the start of the name is known. Filter "date" with ranges such as "date" >= '2024-01-01' AND "date" < '2024-02-01' rather than EXTRACT or TO_CHAR.
+    10. If the question asks for similar, comparable or alternative items and similar line items are listed above, filter with "id" IN (...) using the ids of the relevant ones instead of ILIKE patterns.
 """
 
 # template for answering the question
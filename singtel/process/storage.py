@@ -0,0 +1,13 @@
+import os
+
+# Persistent caches (OCR text, LLM responses, exchange rates, ...) live here.
+CACHE_DIR = os.environ.get(
+    "SINGTEL_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache")),
+)
+
+
+def get_cache_path(filename):
+    """Return the absolute path of a cache file, creating the cache directory."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
@@ -2,28 +2,41 @@ import ast
 import base64
 import io
 import logging
-import os
 import re
 from io import StringIO
 
-import pandas as pd
-import requests
-from openai import OpenAI
-from openpyxl import load_workbook
-from openpyxl_image_loader import SheetImageLoader
-import easyocr
-from io import BytesIO
 import numpy as np
+import pandas as pd
+
+from .exchange_rate import convert_to_usd, get_exchange_rate  # noqa: F401  (re-exported for callers)
+from .gazetteer import get_gazetteer
+from .header_mapper import resolve_header_mapping
+from .llm_cache import cached_completion, template_version
+from .llm_client import get_llm_client
+from .llm_executor import llm_deadline, llm_slot
+from .mapping_prompt import (
+    header_mapping_template,
+    mapping_system_prompt,
+    rest_data_template,
+)
+from .numeric import parse_numeric
+from .ocr import extract_text_from_image  # noqa: F401  (re-exported for callers)
+from .workbook import load_uploaded_workbook
 
 # Configure the logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+LLM_MODEL = "gpt-4o"
+LLM_TEMPERATURE = 0
+MAPPING_PROMPT_VERSION = template_version(header_mapping_template, mapping_system_prompt)
+REST_DATA_PROMPT_VERSION = template_version(rest_data_template, mapping_system_prompt)
+
+
 def chat_completion(prompt_value, system_value=""):
-    client = OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o",
+    response = get_llm_client().chat(
+        model=LLM_MODEL,
         messages=[
             {
                 "system": f"{system_value}",
@@ -32,7 +45,9 @@ def chat_completion(prompt_value, system_value=""):
             }
         ],
         stream=False,
-        temperature=0,
+        temperature=LLM_TEMPERATURE,
+        deadline=llm_deadline(),
+        gate=llm_slot,
     )
 
     return response
@@ -46,54 +61,98 @@ def get_header(df):
     return header_row_values, header_row_index
 
 
-def get_end_of_table(df, header_row):
+def empty_row_mask(df):
+    """Boolean array, True where a row is entirely null or entirely blank strings."""
+    all_null = np.ones(len(df), dtype=bool)
+    all_blank = np.ones(len(df), dtype=bool)
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        all_null &= column.isnull().to_numpy()
+        # Only rows still blank so far need their strings stripped
+        candidates = np.flatnonzero(all_blank)
+        if not len(candidates):
+            continue
+        values = column.iloc[candidates]
+        if values.dtype.kind in "biufcmM":
+            # str() of a number, bool or timestamp (NaN/NaT included) is never blank
+            all_blank[candidates] = False
+        else:
+            blank = values.astype(str).str.strip().eq("").to_numpy()
+            all_blank[candidates[~blank]] = False
+    return all_null | all_blank
+
+
+def _empty_run_lengths(mask):
+    # run[i] = number of consecutive empty rows ending at position i
+    positions = np.arange(len(mask))
+    last_non_empty = np.maximum.accumulate(np.where(mask, -1, positions))
+    return positions - last_non_empty
+
+
+def get_end_of_table(df, header_row, threshold=2):
     # Step 2: Identify the end of table
     df = df.iloc[header_row:]
 
-    # Define a threshold for consecutive empty rows to confirm the end of the table
-    threshold = 2
-    empty_row_count = 0
+    # The table ends at the first run of `threshold` consecutive empty rows
     end_row = df.index[-1]  # Start with the last index of the DataFrame
-
-    # Iterate to find the end of the table
-    for index, row in df.iterrows():
-        if row.isnull().all() or all(row.astype(str).str.strip() == ""):
-            empty_row_count += 1
-            if empty_row_count >= threshold:
-                end_row = index - threshold + 1
-                break
-        else:
-            empty_row_count = 0
+    hits = np.flatnonzero(_empty_run_lengths(empty_row_mask(df)) >= threshold)
+    if len(hits):
+        end_row = df.index[hits[0]] - threshold + 1
 
     return end_row
 
 
+def get_table_blocks(df, threshold=2):
+    """Every table block in the sheet as (first_row, last_row) index labels.
+
+    Blocks are runs of rows separated by at least ``threshold`` consecutive
+    empty rows; shorter gaps stay inside a block, as in get_end_of_table.
+    """
+    mask = empty_row_mask(df)
+    if not len(mask) or mask.all():
+        return []
+    # Empty rows share a run id with the non-empty row before them; a run of
+    # `threshold` or more empties is a gap between blocks.
+    run_id = np.cumsum(~mask)
+    empties_per_run = np.bincount(run_id, weights=mask)
+    gap_rows = mask & (empties_per_run[run_id] >= threshold)
+    # Leading/trailing empties never belong to a block
+    non_empty = np.flatnonzero(~mask)
+    in_block = ~gap_rows
+    in_block[: non_empty[0]] = False
+    in_block[non_empty[-1] + 1 :] = False
+
+    edges = np.diff(np.concatenate(([0], in_block.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return [(df.index[start], df.index[end]) for start, end in zip(starts, ends)]
+
+
 def get_mapping(header, desired_columns, row_data):
     output = {
         "Desired ColumnA": "Header1",
         "Desired ColumnB": "Header2",
         "Desired ColumnC": "",
     }
-    prompt = f"""
-    header: {header}
-    desired columns: {desired_columns}
-    sample_raw_data: {row_data}
-
-    Provide the dictionary with mappings where each desired column is associated with its corresponding header from the raw data. If a desired column cannot be mapped, ensure it remains empty.
-    Note: Item column can contain different types of services, hardware, devices and software such as professional services, subscription, routers and cabling etc. Item can be a some material, item but not Id or number.
-    if you are able to identify description in source column then make sure to map it with only description of desired column.
-
-    Example Output: {output}
-    Note: do not provide any other text except the json mentioned above not even ```json.
-    """
-
-    system_prompt = f"""
-    You are a helpful assistant specializing in mapping data columns.
-    """
+    prompt = header_mapping_template.format(
+        header=header, desired_columns=desired_columns, row_data=row_data, output=output
+    )
 
-    response = chat_completion(prompt, system_prompt)
-    response = response.choices[0].message.content
-    return response
+    # Common layouts are mapped locally; only uncertain ones reach the LLM.
+    # Same header layout -> same mapping, the sample row only guides the LLM.
+    return resolve_header_mapping(
+        header,
+        desired_columns,
+        lambda: cached_completion(
+            "header_mapping",
+            MAPPING_PROMPT_VERSION,
+            LLM_MODEL,
+            LLM_TEMPERATURE,
+            {"header": header, "desired_columns": desired_columns},
+            lambda: chat_completion(prompt, mapping_system_prompt).choices[0].message.content,
+            is_valid=is_dict_response,
+        ),
+    )
 
 
 def get_rest_data_map(rest_data_df, desired_columns, suppliers):
@@ -102,29 +161,26 @@ def get_rest_data_map(rest_data_df, desired_columns, suppliers):
         "Desired ColumnB": "value 2",
         "Desired ColumnC": "",
     }
-    prompt = f"""
-    desired columns: {desired_columns}
-    raw_data: {rest_data_df}
-    suppliers: {suppliers}
-
-    Provide the dictionary with mappings where desired column is associated with its raw data. If a desired column cannot be mapped, ensure it remains empty.
-    Here, we can only map these desired columns: Date, Country, City, Supplier, Quote #, Currency.
-    Please check suppliers if any supplier name found in it and map with Supplier otherwise check throughly for Supplier.
-    Also, Supplier should not be SingTel or Singapore telecommunication or SINGAPORE TELECOM HONG KONG LIMITED and Dataformat should be like "14-Nov-2024"
-    Do not update country or city from company adress or company name.
-    
-    Currency should be in ISO 4217 format (e.g., USD, EUR).
-    Example Output: {output}
-    Note: do not provide any other text except the json mentioned above not even ```json.
-    """
-
-    system_prompt = f"""
-    You are a helpful assistant specializing in mapping data columns.
-    """
+    prompt = rest_data_template.format(
+        desired_columns=desired_columns,
+        rest_data_df=rest_data_df,
+        suppliers=suppliers,
+        output=output,
+    )
 
-    response = chat_completion(prompt, system_prompt)
-    response = response.choices[0].message.content
-    return response
+    return cached_completion(
+        "rest_data_mapping",
+        REST_DATA_PROMPT_VERSION,
+        LLM_MODEL,
+        LLM_TEMPERATURE,
+        {
+            "desired_columns": desired_columns,
+            "rest_data": rest_data_df,
+            "suppliers": suppliers,
+        },
+        lambda: chat_completion(prompt, mapping_system_prompt).choices[0].message.content,
+        is_valid=is_dict_response,
+    )
 
 
 def convert_str_to_dict(mapped_dict_str):
@@ -139,117 +195,95 @@ def convert_str_to_dict(mapped_dict_str):
     return mapped_dict
 
 
-def apply_restriction_on_df(new_df):
-    # drop rows which have total cost is 0
-    new_df = new_df[new_df["Total Cost"] != 0]
-
-    # If a blank row is found, drop all rows from that index onward
-    drop_index = None
-    count = 0
-    for i, row in new_df.iterrows():
-        if row["Item"].strip() == "" or row["Description"].strip() == "":
-            count += 1
-            if count >= 2:
-                drop_index = i
-                break
-    if drop_index is not None:
-        new_df = new_df.loc[:drop_index]
-
-    # If item and description are same drop those rows.
-    new_df = new_df.drop_duplicates(subset=["Item", "Description"], keep="first")
-
-    # Drop rows where both 'Item' and 'Description' are blank
-    new_df = new_df[
-        ~(
-            (new_df["Item"].astype(str).str.strip() == "")
-            | (new_df["Description"].astype(str).str.strip() == "")
+def is_dict_response(response):
+    try:
+        return isinstance(ast.literal_eval(response), dict)
+    except (ValueError, SyntaxError):
+        return False
+
+
+# Post-mapping cleanup rules per template.
+#   drop_zero_cost:    drop rows whose Total Cost equals 0
+#   drop_blank_cost:   also drop rows whose Total Cost is the empty string
+#   blank_row_cutoff:  cut the table at the Nth row with a blank Item or Description
+#   dedupe:            drop repeated (Item, Description) pairs, keeping the first
+#   drop_blank:        "any" drops rows with a blank Item or Description,
+#                      "all" only rows where both are blank
+RESTRICTION_RULES = {
+    "A": {
+        "drop_zero_cost": True,
+        "drop_blank_cost": False,
+        "blank_row_cutoff": 2,
+        "dedupe": True,
+        "drop_blank": "any",
+    },
+    "C": {
+        "drop_zero_cost": True,
+        "drop_blank_cost": True,
+        "blank_row_cutoff": None,
+        "dedupe": False,
+        "drop_blank": "all",
+    },
+}
+
+
+def apply_restrictions(new_df, rules):
+    """Apply a template's cleanup rules in a single filtering pass.
+
+    Item and Description are stripped once; every rule becomes a boolean
+    mask over the rows and the frame is indexed once at the end.
+    """
+    keep = np.ones(len(new_df), dtype=bool)
+    if rules["drop_zero_cost"]:
+        keep &= (new_df["Total Cost"] != 0).to_numpy()
+    if rules["drop_blank_cost"]:
+        keep &= (new_df["Total Cost"].astype(str) != "").to_numpy()
+
+    item_blank = new_df["Item"].astype(str).str.strip().eq("").to_numpy()
+    description_blank = new_df["Description"].astype(str).str.strip().eq("").to_numpy()
+
+    cutoff = rules["blank_row_cutoff"]
+    if cutoff:
+        # Everything after the cutoff-th surviving row with a blank Item or
+        # Description goes (that row itself is removed by the blank rule).
+        counted = keep & (item_blank | description_blank)
+        reached = np.flatnonzero(counted & (np.cumsum(counted) >= cutoff))
+        if len(reached):
+            keep[reached[0] + 1 :] = False
+
+    if rules["dedupe"]:
+        positions = np.flatnonzero(keep)
+        duplicated = new_df.iloc[positions].duplicated(
+            subset=["Item", "Description"], keep="first"
         )
-    ]
-    return new_df
+        keep[positions[duplicated.to_numpy()]] = False
+
+    if rules["drop_blank"] == "any":
+        keep &= ~(item_blank | description_blank)
+    elif rules["drop_blank"] == "all":
+        keep &= ~(item_blank & description_blank)
 
+    return new_df[keep]
 
-def update_city_country(row, city_to_country, country_list):
-    for col in row.index:
-        if col not in ["Country", "City"]:
-            cell_value = row[col]
-            if pd.isna(cell_value):
-                continue
 
-            cell_value_parts = re.split(r"\s*[,.;]\s*", str(cell_value).strip())
-            for part in cell_value_parts:
-                part = part.strip()
-                if part in city_to_country:
-                    row["Country"] = city_to_country[part]["country"]
-                    row["City"] = part
-                    return row
-                elif part in country_list:
-                    row["Country"] = part
-                    row["City"] = None
-                    return row
-    return row
+def apply_restriction_on_df(new_df):
+    return apply_restrictions(new_df, RESTRICTION_RULES["A"])
 
 
 def extract_numeric(value):
     """Extract the numeric part from a mixed value (number + string)."""
-    if isinstance(value, str):
-        match = re.search(r"\d+\.?\d*", value)
-        if match:
-            return float(match.group(0))
-    elif isinstance(value, (int, float)):
-        return value
-    return pd.NA
+    number = parse_numeric(pd.Series([value], dtype=object)).iloc[0]
+    return pd.NA if pd.isna(number) else number
 
 
 def update_unit_cost(df):
-    df["Total Cost"] = df["Total Cost"].apply(extract_numeric)
-    df["QTY"] = df["QTY"].apply(extract_numeric)
-    df["Total Cost"] = pd.to_numeric(df["Total Cost"], errors="coerce")
-    df["QTY"] = pd.to_numeric(df["QTY"], errors="coerce")
+    df["Total Cost"] = parse_numeric(df["Total Cost"])
+    df["QTY"] = parse_numeric(df["QTY"])
     df["Unit Cost"] = df["Total Cost"] / df["QTY"]
 
     return df
 
 
-def get_exchange_rate(from_currency, to_currency="USD"):
-    if from_currency:
-        url = (
-            f"https://api.frankfurter.app/latest?from={from_currency}&to={to_currency}"
-        )
-        response = requests.get(url)
-        data = response.json()
-        if "error" not in data:
-            return data["rates"][to_currency]
-        else:
-            print(f"Error fetching exchange rate: {data['error']}")
-    return 1
-
-
-def convert_to_usd(amount, from_currency):
-    if from_currency == "USD":
-        return round(amount, 2)
-    exchange_rate = get_exchange_rate(from_currency)
-    if exchange_rate:
-        return round(amount * exchange_rate, 2)
-    else:
-        return None
-
-
-def city_country_mapped_list():
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "../files/worldcities.csv")
-    file_path = os.path.abspath(file_path)
-    city_country_df = pd.read_csv(file_path)
-    city_country_df_aggregated = (
-        city_country_df.groupby("city_ascii").first().reset_index()
-    )
-    city_to_country = city_country_df_aggregated.set_index("city_ascii")[
-        ["country"]
-    ].to_dict("index")
-    country_list = city_country_df_aggregated["country"].unique()
-
-    return city_to_country, country_list
-
-
 def get_response(df_str, desired_columns):
     prompt = f"""
     Follow below rules for respective columns and do the mapping accordingly :
@@ -307,31 +341,7 @@ def get_response(df_str, desired_columns):
 
 
 def get_mapping_data(header, desired_columns, row_data):
-    output = {
-        "Desired ColumnA": "Header1",
-        "Desired ColumnB": "Header2",
-        "Desired ColumnC": "",
-    }
-    prompt = f"""
-    header: {header}
-    desired columns: {desired_columns}
-    sample_raw_data: {row_data}
-
-    Provide the dictionary with mappings where each desired column is associated with its corresponding header from the raw data. If a desired column cannot be mapped, ensure it remains empty.
-    Note: Item column can contain different types of services, hardware, devices and software such as professional services, subscription, routers and cabling etc. Item can be a some material, item but not Id or number.
-    if you are able to identify description in source column then make sure to map it with only description of desired column.
-
-    Example Output: {output}
-    Note: do not provide any other text except the json mentioned above not even ```json.
-    """
-
-    system_prompt = f"""
-    You are a helpful assistant specializing in mapping data columns.
-    """
-
-    response = chat_completion(prompt, system_prompt)
-    response = response.choices[0].message.content
-    return response
+    return get_mapping(header, desired_columns, row_data)
 
 
 def has_valid_header(df, threshold=0.5):
@@ -363,76 +373,90 @@ def contains_bom_or_missing_price(columns):
 
 
 def apply_restriction_on_c_df(new_df):
-    # drop rows which have total cost is 0
-    new_df = new_df[
-        (new_df["Total Cost"] != 0) & (new_df["Total Cost"].astype(str) != "")
-    ]
+    return apply_restrictions(new_df, RESTRICTION_RULES["C"])
 
-    # If item and description are same drop those rows.
-    # new_df = new_df.drop_duplicates(subset=['Item', 'Description'], keep='first')
 
-    # Drop rows where both 'Item' and 'Description' are blank
-    new_df = new_df[
-        ~(
-            (new_df["Item"].astype(str).str.strip() == "")
-            & (new_df["Description"].astype(str).str.strip() == "")
-        )
-    ]
-    return new_df
+# Line-item column <- quotation sheet column
+QUOTATION_FIELDS = {
+    "Country": "Country",
+    "City": "Address (TO BE DEPLOYED)",
+    "Supplier": "Solution",
+    "Quote #": "Customer Site ID/Name",
+}
 
 
-def update_row(row, quotation_df):
-    match_key = row["Match Key"]
-    if pd.notna(match_key):  # Ensure match_key is not NaN
-        matching_row = quotation_df[quotation_df["BOM"] == match_key]
-        if not matching_row.empty:
-            row["Country"] = matching_row.iloc[0]["Country"]
-            row["City"] = matching_row.iloc[0]["Address (TO BE DEPLOYED)"]
-            row["Supplier"] = matching_row.iloc[0]["Solution"]
-            row["Quote #"] = matching_row.iloc[0]["Customer Site ID/Name"]
-    return row
+def enrich_from_quotation(new_df, quotation_df):
+    """Fill quotation fields for all line items with one keyed merge on Match Key = BOM.
+
+    For every line item:
+    - a BOM that appears several times in the quotation sheet uses its first row
+    - line items whose Match Key is NaN or not in the quotation keep their values
+    - quotation columns that are missing leave the matching fields untouched
+    """
+    if quotation_df is None or "BOM" not in quotation_df.columns:
+        logger.warning("No quotation BOM column found, skipping quotation lookup")
+        return new_df
+
+    fields = {
+        target: source
+        for target, source in QUOTATION_FIELDS.items()
+        if source in quotation_df.columns
+    }
+    for target, source in QUOTATION_FIELDS.items():
+        if target not in fields:
+            logger.warning(f"Quotation sheet has no '{source}' column, {target} not filled")
+    if not fields:
+        return new_df
+
+    quotation = quotation_df[quotation_df["BOM"].notna()]
+    duplicated = quotation["BOM"].duplicated(keep="first")
+    if duplicated.any():
+        logger.info(f"{duplicated.sum()} duplicate BOM keys in quotation sheet, first row used")
+    lookup = pd.DataFrame(
+        {f"__quotation_{target}": quotation[source].to_numpy() for target, source in fields.items()}
+    )
+    # Object keys on both sides so mixed int/str BOM values compare like ==
+    lookup["__bom"] = quotation["BOM"].to_numpy(dtype=object)
+    lookup["__matched"] = True
+    lookup = lookup[~duplicated.to_numpy()]
+
+    keys = new_df["Match Key"].where(new_df["Match Key"].notna(), None)
+    merged = pd.DataFrame({"__bom": keys.to_numpy(dtype=object)}).merge(
+        lookup, on="__bom", how="left", validate="many_to_one"
+    )
+    matched = merged["__matched"].eq(True).to_numpy()
+    if not matched.any():
+        return new_df
+
+    new_df = new_df.copy()
+    for target in fields:
+        if target not in new_df.columns:
+            new_df[target] = ""
+        column = new_df[target].astype(object)
+        column[matched] = merged[f"__quotation_{target}"].to_numpy()[matched]
+        new_df[target] = column
+    return new_df
 
 
 def update_city_value(city_value):
-    city_to_country, iso2_to_country = city_country_iso_mapped_list()
+    gazetteer = get_gazetteer()
     # Split the city value
     cities = re.split(r"\s*[,.;]\s*", str(city_value).strip())
-    # print(cities)
     for city in cities:
-        if city in city_to_country:
+        if gazetteer.is_city(city):
             return city
     return None
 
 
 def update_country_value(country_value):
-    city_to_country, iso2_to_country = city_country_iso_mapped_list()
+    gazetteer = get_gazetteer()
     country_value = str(country_value).strip()
-    if country_value in iso2_to_country:
-        return iso2_to_country[country_value]
+    country = gazetteer.country_for_iso2(country_value)
+    if country is not None:
+        return country
     return country_value
 
 
-def city_country_iso_mapped_list():
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "../files/worldcities.csv")
-    file_path = os.path.abspath(file_path)
-    city_country_df = pd.read_csv(file_path)
-    city_country_df_aggregated = (
-        city_country_df.groupby("city_ascii").first().reset_index()
-    )
-    city_to_country = city_country_df_aggregated.set_index("city_ascii")[
-        ["country"]
-    ].to_dict("index")
-    iso2_to_country = (
-        city_country_df_aggregated[["iso2", "country"]]
-        .drop_duplicates()
-        .set_index("iso2")["country"]
-        .to_dict()
-    )
-
-    return city_to_country, iso2_to_country
-
-
 def parse_final_answer(output: str) -> str:
     logger.info(f"Initial Query: {output}")
     # Regular expression to match and extract the SQL query between ```sql and ```
@@ -455,39 +479,4 @@ def log_output(output: str) -> str:
 
 
 def get_images_from_uploaded_file(uploaded_file):
-    try:
-        images = []
-        file_contents = uploaded_file.read()
-
-        # Use 'with' to ensure the stream remains open and is properly closed after use
-        with BytesIO(file_contents) as file_stream:
-            file_name = uploaded_file.name
-            file_extension = file_name.split('.')[-1].lower()
-
-            if file_extension == 'xlsx':
-                wb = load_workbook(file_stream, data_only=True)
-                sheet_names = wb.sheetnames
-
-                if not sheet_names:
-                    print("No sheets found in the workbook.")
-                    return []
-
-                first_sheet = wb[sheet_names[0]]
-                image_loader = SheetImageLoader(first_sheet)
-
-                for row in first_sheet.iter_rows():
-                    for cell in row:
-                        if image_loader.image_in(cell.coordinate):
-                            img = image_loader.get(cell.coordinate)
-                            images.append(img)
-
-        return images
-    except Exception as e:
-        print(f"Error: {e}")
-        return []
-
-def extract_text_from_image(image):
-    reader = easyocr.Reader(['en'])
-    image_np = np.array(image)
-    result = reader.readtext(image_np, detail=0)
-    return " ".join(result)
+    return load_uploaded_workbook(uploaded_file, with_images=True).images()
@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl_image_loader import SheetImageLoader
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc slows parsing down noticeably, so peak memory is opt-in.
+WORKBOOK_TRACE_MEMORY = os.environ.get("WORKBOOK_TRACE_MEMORY", "") == "1"
+
+
+class Workbook:
+    """An uploaded workbook read once and parsed once, shared by the processors.
+
+    The raw bytes are read a single time. Sheets are parsed lazily through one
+    ``pd.ExcelFile`` and cached, so asking for the same sheet twice (or for all
+    sheets after a single one) does not re-open the zip. With ``with_images``
+    the workbook is loaded by openpyxl in full mode once and that same book
+    backs both the embedded images and the DataFrames.
+    """
+
+    def __init__(self, uploaded_file, with_images=False):
+        start = time.perf_counter()
+        if isinstance(uploaded_file, (str, os.PathLike)):
+            self.name = os.path.basename(uploaded_file)
+            with open(uploaded_file, "rb") as f:
+                self.content = f.read()
+        else:
+            self.name = getattr(uploaded_file, "name", "")
+            if hasattr(uploaded_file, "getvalue"):
+                self.content = uploaded_file.getvalue()
+            else:
+                uploaded_file.seek(0)
+                self.content = uploaded_file.read()
+        self.extension = self.name.rsplit(".", 1)[-1].lower() if "." in self.name else ""
+
+        self._book = None
+        self._sheets = {}
+        self._raw_sheets = {}
+        self._images = None
+        self.stats = {"read_seconds": time.perf_counter() - start, "parse_seconds": 0.0}
+
+        with self._measure():
+            if with_images and self.extension == "xlsx":
+                self._book = load_workbook(BytesIO(self.content), data_only=True)
+                self.excel_file = pd.ExcelFile(self._book, engine="openpyxl")
+            else:
+                self.excel_file = pd.ExcelFile(BytesIO(self.content))
+        self.sheet_names = self.excel_file.sheet_names
+
+    @contextmanager
+    def _measure(self):
+        start = time.perf_counter()
+        tracing = WORKBOOK_TRACE_MEMORY and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            self.stats["parse_seconds"] += time.perf_counter() - start
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stats["peak_bytes"] = max(self.stats.get("peak_bytes", 0), peak)
+
+    def _resolve(self, sheet):
+        return self.sheet_names[sheet] if isinstance(sheet, int) else sheet
+
+    def sheet(self, sheet=0):
+        """DataFrame of one sheet (name or position), first row as header.
+
+        A copy is returned so callers may modify it freely.
+        """
+        name = self._resolve(sheet)
+        if name not in self._sheets:
+            with self._measure():
+                self._sheets[name] = self.excel_file.parse(name)
+        return self._sheets[name].copy()
+
+    def sheets(self):
+        """All sheets, like ``pd.read_excel(..., sheet_name=None)``."""
+        return {name: self.sheet(name) for name in self.sheet_names}
+
+    def cell_grid(self, sheet=0):
+        """Raw cell values of a sheet without header inference."""
+        name = self._resolve(sheet)
+        if name not in self._raw_sheets:
+            with self._measure():
+                self._raw_sheets[name] = self.excel_file.parse(name, header=None)
+        return self._raw_sheets[name].copy()
+
+    def images(self):
+        """PIL images embedded in the first sheet (xlsx only)."""
+        if self._images is not None:
+            return self._images
+        images = []
+        if self.extension == "xlsx":
+            try:
+                with self._measure():
+                    if self._book is None:
+                        self._book = load_workbook(BytesIO(self.content), data_only=True)
+                    if not self._book.sheetnames:
+                        print("No sheets found in the workbook.")
+                    else:
+                        first_sheet = self._book[self._book.sheetnames[0]]
+                        image_loader = SheetImageLoader(first_sheet)
+                        for row in first_sheet.iter_rows():
+                            for cell in row:
+                                if image_loader.image_in(cell.coordinate):
+                                    images.append(image_loader.get(cell.coordinate))
+            except Exception as e:
+                print(f"Error: {e}")
+                images = []
+        self._images = images
+        return images
+
+
+def load_uploaded_workbook(uploaded_file, with_images=False):
+    """Wrap an upload (file-like or path) in a Workbook; pass Workbooks through."""
+    if isinstance(uploaded_file, Workbook):
+        return uploaded_file
+    return Workbook(uploaded_file, with_images=with_images)
+
+
+def log_workbook_stats(workbook):
+    stats = workbook.stats
+    message = (
+        f"Workbook {workbook.name}: {len(workbook.content) / 1024:.0f} KiB read in "
+        f"{stats['read_seconds']:.3f}s, parsed in {stats['parse_seconds']:.3f}s"
+    )
+    if "peak_bytes" in stats:
+        message += f", peak {stats['peak_bytes'] / 2**20:.1f} MiB"
+    logger.info(message)
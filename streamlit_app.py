@@ -1,6 +1,10 @@
 import streamlit as st
 from time import sleep
 from navigation import make_sidebar
+from singtel.process.ocr import warm_up_ocr
+
+# Load the OCR models in the background so the first Template A upload doesn't pay for it
+warm_up_ocr(background=True)
 
 make_sidebar()
 
@@ -0,0 +1,110 @@
+"""Post-mapping cleanup rules (apply_restriction_on_df / apply_restriction_on_c_df).
+
+The fixtures are mapped quote tables as they reach the cleanup step: cell
+values as openpyxl reads them (numbers, strings, "" for blank cells) under
+the destination column names. The expected rows are what the row-by-row
+implementations returned before the columnar rewrite.
+"""
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_restrictions import (
+    legacy_apply_restriction_on_c_df,
+    legacy_apply_restriction_on_df,
+    mapped_quote,
+)
+from singtel.process.utility import (
+    RESTRICTION_RULES,
+    apply_restriction_on_c_df,
+    apply_restriction_on_df,
+    apply_restrictions,
+)
+
+COLUMNS = ["Item", "Description", "Total Cost", "QTY"]
+
+
+def quote(rows):
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+@pytest.fixture
+def template_a_quote():
+    return quote(
+        [
+            ["Router", "ISR 4331", 1200, 2],
+            ["Router ", "ISR 4331", 1200, 2],  # not a duplicate: compared unstripped
+            ["Router", "ISR 4331", 1200, 2],  # duplicate
+            ["Support", "24x7", 0, 1],  # zero cost
+            ["Cabling", "", 50, 1],  # first blank row
+            ["Install", "On site", "300", 1],
+            ["", "", "", ""],  # second blank row: the table ends here
+            ["Notes", "Prices valid 30 days", 10, 1],
+            ["Total", "", 2750, ""],
+        ]
+    )
+
+
+@pytest.fixture
+def template_a_quote_zero_cost_blank():
+    return quote(
+        [
+            ["Switch", "C9200", 900, 1],
+            ["", "", 0, ""],  # zero cost, so not counted towards the cutoff
+            ["Firewall", " ", 400, 1],  # first blank row
+            ["Access point", "Wi-Fi 6", 300, 4],
+        ]
+    )
+
+
+@pytest.fixture
+def template_c_quote():
+    return quote(
+        [
+            ["Router", "ISR", 1200, 1],
+            ["Router", "ISR", 1200, 1],  # no dedupe for Template C
+            ["", "", 50, 1],  # both blank
+            ["Licence", "", 30, 1],  # only one blank: kept
+            ["Support", "24x7", 0, 1],  # zero cost
+            ["Install", "Site", "", 1],  # blank cost
+            ["Cabling", "Cat-6", "0", 3],  # the string "0" is not a zero cost
+            [" ", "  ", 10, 1],  # both blank after stripping
+        ]
+    )
+
+
+def test_template_a(template_a_quote):
+    result = apply_restriction_on_df(template_a_quote)
+    pd.testing.assert_frame_equal(result, template_a_quote.loc[[0, 1, 5]])
+
+
+def test_template_a_cutoff_skips_zero_cost_rows(template_a_quote_zero_cost_blank):
+    result = apply_restriction_on_df(template_a_quote_zero_cost_blank)
+    pd.testing.assert_frame_equal(result, template_a_quote_zero_cost_blank.loc[[0, 3]])
+
+
+def test_template_c(template_c_quote):
+    result = apply_restriction_on_c_df(template_c_quote)
+    pd.testing.assert_frame_equal(result, template_c_quote.loc[[0, 1, 3, 6]])
+
+
+def test_rules_are_per_template(template_c_quote):
+    rules = dict(RESTRICTION_RULES["C"], dedupe=True)
+    result = apply_restrictions(template_c_quote, rules)
+    pd.testing.assert_frame_equal(result, template_c_quote.loc[[0, 3, 6]])
+
+
+def test_empty_quote():
+    empty = quote([])
+    assert apply_restriction_on_df(empty).empty
+    assert apply_restriction_on_c_df(empty).empty
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_matches_row_by_row_implementation(seed):
+    df = mapped_quote(random.Random(seed).randint(0, 40), seed)
+    pd.testing.assert_frame_equal(apply_restriction_on_df(df), legacy_apply_restriction_on_df(df))
+    pd.testing.assert_frame_equal(
+        apply_restriction_on_c_df(df), legacy_apply_restriction_on_c_df(df)
+    )